@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Módulo de Armazenamento - Sistema de Controle de Gastos Pessoais
+Centraliza a leitura e gravação do banco de dados de gastos em Parquet,
+mantendo o Excel apenas como formato de exportação.
+"""
+
+import importlib.util
+import os
+import pandas as pd
+from typing import List, Optional
+
+ARQUIVO_BD_PADRAO = "../data/gastos.parquet"
+
+# XlsxWriter grava a planilha em streaming (memória constante); sem ele, usa o openpyxl
+_MOTOR_EXCEL = 'xlsxwriter' if importlib.util.find_spec('xlsxwriter') else 'openpyxl'
+
+def caminho_excel(arquivo_bd: str) -> str:
+    """
+    Retorna o caminho do arquivo Excel correspondente ao banco de dados.
+    
+    Args:
+        arquivo_bd: Caminho do banco de dados
+    
+    Returns:
+        Caminho com extensão .xlsx
+    """
+    return os.path.splitext(arquivo_bd)[0] + ".xlsx"
+
+def banco_existe(arquivo_bd: str = ARQUIVO_BD_PADRAO) -> bool:
+    """
+    Verifica se existe banco de dados (Parquet ou Excel legado).
+    
+    Args:
+        arquivo_bd: Caminho do banco de dados
+    
+    Returns:
+        True se algum dos arquivos existir
+    """
+    return os.path.exists(arquivo_bd) or os.path.exists(caminho_excel(arquivo_bd))
+
+def arquivo_banco(arquivo_bd: str = ARQUIVO_BD_PADRAO) -> str:
+    """
+    Retorna o arquivo efetivamente lido para o banco de dados.
+    
+    Args:
+        arquivo_bd: Caminho do banco de dados
+    
+    Returns:
+        O próprio caminho, ou o gastos.xlsx legado se o Parquet ainda não existir
+    
+    Raises:
+        FileNotFoundError: Se nenhum dos arquivos existir
+    """
+    if arquivo_bd.endswith('.xlsx') or os.path.exists(arquivo_bd):
+        return arquivo_bd
+    if os.path.exists(caminho_excel(arquivo_bd)):
+        return caminho_excel(arquivo_bd)
+    raise FileNotFoundError(f"Banco de dados não encontrado: {arquivo_bd}")
+
+def carregar_gastos(arquivo_bd: str = ARQUIVO_BD_PADRAO, colunas: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Carrega o banco de dados de gastos.
+    
+    Se o arquivo Parquet ainda não existir, o gastos.xlsx legado é convertido
+    uma única vez (migrar_excel_legado) e as leituras seguintes já usam o Parquet.
+    Com colunas informadas, o Parquet lê apenas essas colunas do disco.
+    
+    Args:
+        arquivo_bd: Caminho do banco de dados
+        colunas: Colunas a carregar (None carrega todas)
+    
+    Returns:
+        DataFrame com os dados
+    """
+    arquivo = arquivo_banco(arquivo_bd)
+    if arquivo != arquivo_bd and migrar_excel_legado(arquivo_bd):
+        arquivo = arquivo_bd
+    
+    if arquivo.endswith('.xlsx'):
+        return pd.read_excel(arquivo, engine='openpyxl', usecols=colunas)
+    return pd.read_parquet(arquivo, engine='pyarrow', columns=colunas)
+
+def contar_registros(arquivo_bd: str = ARQUIVO_BD_PADRAO) -> int:
+    """
+    Conta os registros do banco de dados sem carregar os dados.
+    
+    No Parquet o número de linhas vem dos metadados do arquivo; no Excel legado,
+    da dimensão da planilha (aberta em modo somente leitura).
+    
+    Args:
+        arquivo_bd: Caminho do banco de dados
+    
+    Returns:
+        Número de registros (sem contar o cabeçalho)
+    """
+    arquivo = arquivo_banco(arquivo_bd)
+    if arquivo.endswith('.xlsx'):
+        from openpyxl import load_workbook
+        wb = load_workbook(arquivo, read_only=True, data_only=True)
+        try:
+            return max(wb.active.max_row - 1, 0)
+        finally:
+            wb.close()
+    
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(arquivo).metadata.num_rows
+
+def migrar_excel_legado(arquivo_bd: str = ARQUIVO_BD_PADRAO) -> bool:
+    """
+    Converte o gastos.xlsx legado para o banco de dados Parquet.
+    
+    Args:
+        arquivo_bd: Caminho do banco de dados Parquet a criar
+    
+    Returns:
+        True se o Parquet foi gravado, False caso contrário (o Excel segue em uso)
+    """
+    try:
+        df = pd.read_excel(caminho_excel(arquivo_bd), engine='openpyxl')
+        salvar_gastos(df, arquivo_bd)
+        print(f"📦 Banco de dados migrado para Parquet: {arquivo_bd}")
+        return True
+    except Exception as e:
+        print(f"⚠️  Não foi possível migrar o banco de dados para Parquet: {e}")
+        return False
+
+def _escrever_excel(df: pd.DataFrame, arquivo: str):
+    """
+    Grava o DataFrame em .xlsx com o motor mais rápido disponível.
+    
+    Com o XlsxWriter, as linhas são gravadas em ordem no modo constant_memory
+    (o to_excel do pandas grava coluna a coluna, o que esse modo não suporta).
+    """
+    if _MOTOR_EXCEL != 'xlsxwriter':
+        df.to_excel(arquivo, index=False, engine='openpyxl')
+        return
+    
+    import xlsxwriter
+    
+    valores = df.astype(object).where(df.notna(), None)  # Células vazias em vez de NaN
+    wb = xlsxwriter.Workbook(arquivo, {'constant_memory': True, 'default_date_format': 'dd/mm/yyyy'})
+    try:
+        ws = wb.add_worksheet()
+        ws.write_row(0, 0, [str(coluna) for coluna in df.columns])
+        for linha, registro in enumerate(valores.itertuples(index=False, name=None), start=1):
+            ws.write_row(linha, 0, registro)
+    finally:
+        wb.close()
+
+def salvar_gastos(df: pd.DataFrame, arquivo_bd: str = ARQUIVO_BD_PADRAO):
+    """
+    Salva o banco de dados de gastos.
+    
+    Args:
+        df: DataFrame com os dados
+        arquivo_bd: Caminho do banco de dados
+    """
+    if arquivo_bd.endswith('.xlsx'):
+        _escrever_excel(df, arquivo_bd)
+    else:
+        df.to_parquet(arquivo_bd, engine='pyarrow', compression='zstd', index=False)
+
+def exportar_excel(arquivo_bd: str = ARQUIVO_BD_PADRAO, arquivo_saida: Optional[str] = None) -> str:
+    """
+    Exporta o banco de dados para Excel, para consulta manual.
+    
+    Args:
+        arquivo_bd: Caminho do banco de dados
+        arquivo_saida: Caminho do Excel gerado (padrão: mesmo nome com .xlsx)
+    
+    Returns:
+        Caminho do arquivo exportado
+    """
+    arquivo_saida = arquivo_saida or caminho_excel(arquivo_bd)
+    _escrever_excel(carregar_gastos(arquivo_bd), arquivo_saida)
+    print(f"📤 Banco de dados exportado para: {arquivo_saida}")
+    return arquivo_saida
+
+def main():
+    """Exporta o banco de dados atual para Excel."""
+    if not banco_existe():
+        print("❌ Banco de dados não encontrado!")
+        return False
+    
+    exportar_excel()
+    return True
+
+if __name__ == "__main__":
+    main()
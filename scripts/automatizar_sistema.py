@@ -8,37 +8,62 @@ import os
 import sys
 import subprocess
 import time
-from datetime import datetime
-from typing import List, Dict, Tuple
-import glob
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import List, Dict, Set, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from armazenamento import banco_existe, carregar_gastos
+
+# Trecho presente nas URLs de exemplo de config_google_drive.py (ainda não configuradas)
+MARCADOR_URL_EXEMPLO = 'EXEMPLO_FILE_ID'
 
 class AutomacaoSistema:
-    def __init__(self, pasta_faturas: str = "../faturas", pasta_data: str = "../data"):
-        self.pasta_faturas = pasta_faturas
-        self.pasta_data = pasta_data
-        self.arquivo_controle = os.path.join(pasta_data, "controle_processamento.txt")
-        self.log_execucoes = []
+    URL_DASHBOARD = "http://localhost:8501"
+    PREFIXOS_FATURAS = ("fatura-inter-", "Fatura_")
+    FORMATO_TIMESTAMP = "%d/%m/%Y %H:%M:%S"
+    MAX_LOGS = 5000        # Entradas de log mantidas em memória
+    LOGS_RELATORIO = 50    # Entradas incluídas no relatório resumido
+    
+    def __init__(self, pasta_faturas: str = "../faturas", pasta_data: str = "../data", usar_subprocesso: bool = False):
+        # Caminhos montados uma única vez (sem resolve(), para manter as entradas
+        # do arquivo de controle no mesmo formato relativo de sempre)
+        self.pasta_faturas = Path(pasta_faturas)
+        self.pasta_data = Path(pasta_data)
+        self.usar_subprocesso = usar_subprocesso
+        self.arquivo_controle = self.pasta_data / "controle_processamento.txt"
+        self._estrutura_ok = False
+        self.log_execucoes = deque(maxlen=self.MAX_LOGS)
+        self._processados = None
+        self._marcacoes_pendentes = []
+        
+        # Sessão HTTP reutilizada nas verificações do dashboard (evita novo handshake a cada chamada)
+        self._http = requests.Session()
+        self._http.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=2))
     
     def log(self, mensagem: str, tipo: str = "INFO"):
         """Registra mensagem no log."""
-        timestamp = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-        log_entry = f"[{timestamp}] {tipo}: {mensagem}"
+        log_entry = "[" + time.strftime(self.FORMATO_TIMESTAMP) + "] " + tipo + ": " + mensagem
         print(log_entry)
         self.log_execucoes.append(log_entry)
     
     def verificar_estrutura_projeto(self) -> bool:
-        """Verifica se a estrutura do projeto está correta."""
+        """Verifica se a estrutura do projeto está correta (resultado positivo fica em cache)."""
+        if self._estrutura_ok:
+            return True
+        
         self.log("Verificando estrutura do projeto...")
         
         # Verificar pastas essenciais
         pastas_necessarias = [
             self.pasta_faturas,
             self.pasta_data,
-            "."  # pasta scripts
+            Path(".")  # pasta scripts
         ]
         
         for pasta in pastas_necessarias:
-            if not os.path.exists(pasta):
+            if not pasta.is_dir():
                 self.log(f"Pasta não encontrada: {pasta}", "ERRO")
                 return False
         
@@ -52,29 +77,30 @@ class AutomacaoSistema:
         ]
         
         for script in scripts_necessarios:
-            if not os.path.exists(script):
+            if not Path(script).is_file():
                 self.log(f"Script não encontrado: {script}", "ERRO")
                 return False
         
         self.log("✅ Estrutura do projeto verificada com sucesso")
+        self._estrutura_ok = True
         return True
     
     def detectar_novos_arquivos(self) -> List[str]:
         """Detecta novos arquivos CSV na pasta de faturas."""
         self.log("Detectando novos arquivos...")
         
-        # Padrões de arquivos suportados
-        padroes = [
-            "fatura-inter-*.csv",
-            "Fatura_*.csv"
-        ]
-        
-        arquivos_encontrados = []
-        for padrao in padroes:
-            caminho_padrao = os.path.join(self.pasta_faturas, padrao)
-            arquivos_encontrados.extend(glob.glob(caminho_padrao))
+        # Varredura única da pasta, filtrando pelos prefixos suportados
+        try:
+            with os.scandir(self.pasta_faturas) as entradas:
+                arquivos_encontrados = sorted(
+                    str(self.pasta_faturas / entrada.name) for entrada in entradas
+                    if entrada.name.startswith(self.PREFIXOS_FATURAS) and entrada.name.endswith('.csv')
+                    and entrada.is_file()
+                )
+        except FileNotFoundError:
+            arquivos_encontrados = []
         
-        # Verificar arquivos já processados
+        # Verificar arquivos já processados (set: busca O(1) por arquivo)
         arquivos_processados = self.obter_arquivos_processados()
         novos_arquivos = [arq for arq in arquivos_encontrados if arq not in arquivos_processados]
         
@@ -87,25 +113,41 @@ class AutomacaoSistema:
         
         return novos_arquivos
     
-    def obter_arquivos_processados(self) -> List[str]:
-        """Obtém lista de arquivos já processados."""
-        if not os.path.exists(self.arquivo_controle):
-            return []
+    def obter_arquivos_processados(self) -> Set[str]:
+        """Obtém o conjunto de arquivos já processados (lido do disco uma única vez)."""
+        if self._processados is not None:
+            return self._processados
+        
+        self._processados = set()
+        if not self.arquivo_controle.is_file():
+            return self._processados
         
         try:
             with open(self.arquivo_controle, 'r', encoding='utf-8') as f:
-                return [linha.strip() for linha in f.readlines() if linha.strip()]
+                self._processados = {linha.strip() for linha in f if linha.strip()}
         except Exception as e:
             self.log(f"Erro ao ler arquivo de controle: {e}", "AVISO")
-            return []
+        
+        return self._processados
     
     def marcar_arquivo_processado(self, arquivo: str):
-        """Marca arquivo como processado."""
+        """Marca arquivo como processado (gravado no disco por gravar_marcacoes_pendentes)."""
+        self.obter_arquivos_processados().add(arquivo)
+        self._marcacoes_pendentes.append(arquivo)
+    
+    def gravar_marcacoes_pendentes(self):
+        """Grava de uma vez no arquivo de controle todos os arquivos marcados como processados."""
+        if not self._marcacoes_pendentes:
+            return
+        
         try:
             with open(self.arquivo_controle, 'a', encoding='utf-8') as f:
-                f.write(f"{arquivo}\n")
+                f.writelines(f"{arquivo}\n" for arquivo in self._marcacoes_pendentes)
+                f.flush()
+                os.fsync(f.fileno())
+            self._marcacoes_pendentes.clear()
         except Exception as e:
-            self.log(f"Erro ao marcar arquivo como processado: {e}", "AVISO")
+            self.log(f"Erro ao marcar arquivos como processados: {e}", "AVISO")
     
     def executar_processamento(self, novos_arquivos: List[str]) -> bool:
         """Executa o processamento completo dos novos arquivos."""
@@ -118,15 +160,16 @@ class AutomacaoSistema:
         try:
             # 1. Executar processamento de faturas
             self.log("📊 Executando processamento de faturas...")
-            resultado = subprocess.run(
-                [sys.executable, "processar_faturas.py"],
-                capture_output=True,
-                text=True,
-                cwd="."
-            )
             
-            if resultado.returncode != 0:
-                self.log(f"Erro no processamento: {resultado.stderr}", "ERRO")
+            if self.usar_subprocesso:
+                sucesso = self._processar_em_subprocesso()
+            else:
+                # Execução no próprio processo: evita nova inicialização do Python e do pandas
+                from processar_faturas import main as processar_faturas_main
+                sucesso = processar_faturas_main()
+            
+            if not sucesso:
+                self.log("Erro no processamento de faturas", "ERRO")
                 return False
             
             self.log("✅ Processamento concluído com sucesso")
@@ -134,6 +177,7 @@ class AutomacaoSistema:
             # Marcar arquivos como processados
             for arquivo in novos_arquivos:
                 self.marcar_arquivo_processado(arquivo)
+            self.gravar_marcacoes_pendentes()
             
             return True
             
@@ -141,25 +185,57 @@ class AutomacaoSistema:
             self.log(f"Erro durante processamento: {e}", "ERRO")
             return False
     
-    def gerar_relatorio_execucao(self) -> Dict:
-        """Gera relatório da execução."""
+    def _processar_em_subprocesso(self) -> bool:
+        """Executa processar_faturas.py em um processo separado (isolamento total)."""
+        # Saída lida linha a linha: log incremental e memória constante
+        processo = subprocess.Popen(
+            [sys.executable, "-u", "processar_faturas.py"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            cwd="."
+        )
+        
+        for linha in processo.stdout:
+            self.log(linha.rstrip())
+        
+        codigo_retorno = processo.wait()
+        if codigo_retorno != 0:
+            self.log(f"Erro no processamento (código de saída {codigo_retorno})", "ERRO")
+            return False
+        
+        return True
+    
+    def gerar_relatorio_execucao(self, detalhado: bool = False) -> Dict:
+        """
+        Gera relatório da execução.
+        
+        Args:
+            detalhado: Se True, inclui todo o log; caso contrário, apenas as últimas entradas
+        """
         self.log("📋 Gerando relatório de execução...")
         
+        if detalhado:
+            logs = list(self.log_execucoes)
+        else:
+            logs = list(islice(self.log_execucoes, max(0, len(self.log_execucoes) - self.LOGS_RELATORIO), None))
+        
         relatorio = {
-            'timestamp': datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+            'timestamp': time.strftime(self.FORMATO_TIMESTAMP),
             'status': 'sucesso',
             'arquivos_processados': 0,
             'total_registros': 0,
             'tempo_execucao': 0,
-            'logs': self.log_execucoes.copy()
+            'logs': logs
         }
         
         # Verificar se o banco de dados existe e obter estatísticas
-        arquivo_dados = os.path.join(self.pasta_data, "gastos.xlsx")
-        if os.path.exists(arquivo_dados):
+        arquivo_dados = str(self.pasta_data / "gastos.parquet")
+        if banco_existe(arquivo_dados):
             try:
-                import pandas as pd
-                df = pd.read_excel(arquivo_dados)
+                # Apenas a coluna Data é necessária para o relatório
+                df = carregar_gastos(arquivo_dados, colunas=['Data'])
                 relatorio['total_registros'] = len(df)
                 relatorio['periodo'] = {
                     'inicio': df['Data'].min() if not df.empty else 'N/A',
@@ -176,14 +252,9 @@ class AutomacaoSistema:
         
         try:
             # Verificar se o dashboard já está rodando
-            try:
-                import requests
-                response = requests.get("http://localhost:8501", timeout=2)
-                if response.status_code == 200:
-                    self.log("✅ Dashboard já está rodando em http://localhost:8501")
-                    return True
-            except:
-                pass  # Dashboard não está rodando, vamos iniciar
+            if self.dashboard_respondendo(timeout=2):
+                self.log(f"✅ Dashboard já está rodando em {self.URL_DASHBOARD}")
+                return True
             
             # Iniciar dashboard em background
             processo = subprocess.Popen(
@@ -193,27 +264,27 @@ class AutomacaoSistema:
                 cwd="."
             )
             
-            # Aguardar alguns segundos para o dashboard inicializar
-            time.sleep(5)
-            
-            # Verificar se o dashboard está respondendo
-            try:
-                import requests
-                response = requests.get("http://localhost:8501", timeout=10)
-                if response.status_code == 200:
-                    self.log("✅ Dashboard iniciado com sucesso em http://localhost:8501")
+            # Aguardar o dashboard responder, parando assim que o Streamlit subir
+            for _ in range(20):
+                if self.dashboard_respondendo(timeout=0.5):
+                    self.log(f"✅ Dashboard iniciado com sucesso em {self.URL_DASHBOARD}")
                     return True
-                else:
-                    self.log("⚠️  Dashboard iniciado mas não está respondendo corretamente", "AVISO")
-                    return False
-            except Exception as e:
-                self.log("⚠️  Dashboard iniciado mas verificação falhou", "AVISO")
-                return True  # Assumir sucesso mesmo sem verificação
+                time.sleep(0.25)
+            
+            self.log("⚠️  Dashboard iniciado mas verificação falhou", "AVISO")
+            return True  # Assumir sucesso mesmo sem verificação
                 
         except Exception as e:
             self.log(f"Erro ao iniciar dashboard: {e}", "ERRO")
             return False
     
+    def dashboard_respondendo(self, timeout: float) -> bool:
+        """Verifica se o dashboard responde, reaproveitando a conexão HTTP."""
+        try:
+            return self._http.get(self.URL_DASHBOARD, timeout=timeout).ok
+        except requests.RequestException:
+            return False
+    
     def executar_automacao_completa(self, iniciar_dashboard: bool = True) -> Dict:
         """Executa o ciclo completo de automação."""
         inicio_execucao = time.time()
@@ -260,6 +331,7 @@ def main():
     # Verificar argumentos da linha de comando
     iniciar_dashboard = True
     usar_google_drive = False
+    usar_subprocesso = False
     
     for arg in sys.argv[1:]:
         if arg == "--sem-dashboard":
@@ -268,6 +340,9 @@ def main():
         elif arg == "--google-drive":
             usar_google_drive = True
             print("☁️  Modo Google Drive ativado")
+        elif arg == "--subprocess":
+            usar_subprocesso = True
+            print("🧩 Processamento de faturas em processo separado")
     
     # Baixar arquivos do Google Drive se solicitado
     if usar_google_drive:
@@ -283,7 +358,7 @@ def main():
                 # Filtrar URLs válidas (não exemplo)
                 urls_validas = [
                     item for item in URLS_ARQUIVOS_EXEMPLO 
-                    if 'EXEMPLO_FILE_ID' not in item.get('url', '')
+                    if MARCADOR_URL_EXEMPLO not in item.get('url', '')
                 ]
                 
                 if urls_validas:
@@ -301,7 +376,7 @@ def main():
             print(f"❌ Erro ao baixar do Google Drive: {e}")
     
     # Executar automação
-    automacao = AutomacaoSistema()
+    automacao = AutomacaoSistema(usar_subprocesso=usar_subprocesso)
     relatorio = automacao.executar_automacao_completa(iniciar_dashboard)
     
     # Exibir resultado final
@@ -4,16 +4,97 @@ Módulo de Classificação com LLM - Sistema de Controle de Gastos Pessoais
 Integra o LLM com o banco de dados para classificação automática dos gastos.
 """
 
+import asyncio
+import functools
+import json
+import os
+import tempfile
+import numpy as np
 import pandas as pd
 import time
 from typing import List, Dict, Optional, Tuple
-from config_llm import ConfigLLM
+from config_llm import NOMES_CATEGORIAS, ConfigLLM, categoria_para_id, normalizar_descricao
+from armazenamento import ARQUIVO_BD_PADRAO, carregar_gastos, salvar_gastos
+
+# Valores de Categoria (após strip/lower) tratados como "sem categoria"
+VALORES_SEM_CATEGORIA = {'', 'nan', 'none'}
+
+# Categorias padrão e variações conhecidas, indexadas pela forma casefold
+CATEGORIAS_PADRAO = list(NOMES_CATEGORIAS)
+VARIACOES_CATEGORIAS = {
+    'Alimentacao': 'Alimentação',
+    'Educacao': 'Educação',
+    'Saude': 'Saúde',
+    'Servicos': 'Serviços',
+    'Investimento': 'Investimentos',
+    'Outro': 'Outros',
+    'Other': 'Outros'
+}
+_MAPA_CATEGORIAS = {
+    **{categoria.casefold(): categoria for categoria in CATEGORIAS_PADRAO},
+    **{variacao.casefold(): categoria for variacao, categoria in VARIACOES_CATEGORIAS.items()}
+}
+
+@functools.lru_cache(maxsize=512)
+def limpar_categoria(categoria: str) -> str:
+    """
+    Limpa e padroniza a categoria retornada pelo LLM.
+    
+    Memoizada: o número de respostas distintas do LLM é pequeno.
+    
+    Args:
+        categoria: Categoria bruta retornada pelo LLM
+        
+    Returns:
+        Categoria limpa e padronizada, sempre uma de CATEGORIAS_PADRAO
+        (respostas fora da lista viram 'Outros')
+    """
+    if not categoria:
+        return 'Outros'
+    
+    # Uma única consulta cobre categorias padrão e variações, em qualquer caixa
+    categoria_padrao = _MAPA_CATEGORIAS.get(categoria.strip().casefold())
+    return categoria_para_id(categoria_padrao).nome
+
+class LimitadorTaxa:
+    """
+    Limitador de taxa (token bucket) para requisições assíncronas ao LLM.
+    
+    Permite rajadas de até `capacidade` requisições e depois espera apenas o
+    necessário para respeitar `requisicoes_por_minuto`, em vez de uma pausa fixa.
+    """
+    
+    def __init__(self, requisicoes_por_minuto: int, capacidade: int = 1):
+        self.intervalo = 60.0 / requisicoes_por_minuto
+        self.capacidade = capacidade
+        self.tokens = float(capacidade)
+        self.ultima_reposicao = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def aguardar(self):
+        """Aguarda até haver um token disponível e o consome."""
+        async with self._lock:
+            agora = time.monotonic()
+            self.tokens = min(self.capacidade, self.tokens + (agora - self.ultima_reposicao) / self.intervalo)
+            self.ultima_reposicao = agora
+            
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) * self.intervalo)
+                self.tokens = 1.0
+                self.ultima_reposicao = time.monotonic()
+            
+            self.tokens -= 1
 
 class ClassificadorLLM:
-    def __init__(self, arquivo_bd: str = "../data/gastos.xlsx"):
+    def __init__(self, arquivo_bd: str = ARQUIVO_BD_PADRAO, requisicoes_por_minuto: int = 60, verbose: bool = False):
         self.arquivo_bd = arquivo_bd
-        self.config_llm = ConfigLLM()
+        self.verbose = verbose  # Exibe o resultado de cada registro (o relatório final é sempre exibido)
+        self.requisicoes_por_minuto = requisicoes_por_minuto
         self.df_dados = None
+        self.arquivo_cache = os.path.join(os.path.dirname(arquivo_bd), "llm_cache.json")
+        self._cache = self.carregar_cache()
+        # O LLM compartilha o mesmo cache (inclusive nas classificações individuais de fallback)
+        self.config_llm = ConfigLLM(cache=self._cache)
         self.estatisticas = {
             'total_processados': 0,
             'classificados_com_sucesso': 0,
@@ -47,13 +128,26 @@ class ClassificadorLLM:
             True se carregado com sucesso, False caso contrário.
         """
         try:
-            self.df_dados = pd.read_excel(self.arquivo_bd, engine='openpyxl')
+            self.df_dados = carregar_gastos(self.arquivo_bd)
             print(f"📊 Dados carregados: {len(self.df_dados)} registros")
             return True
         except Exception as e:
             print(f"❌ Erro ao carregar dados: {e}")
             return False
     
+    def definir_dados(self, df: pd.DataFrame):
+        """
+        Usa um DataFrame já carregado em memória (ex.: TratamentoDados.df_atual),
+        evitando reler o banco de dados do disco.
+        
+        As classificações são aplicadas nesse mesmo DataFrame.
+        
+        Args:
+            df: DataFrame com todos os registros do banco de dados
+        """
+        self.df_dados = df
+        print(f"📊 Dados recebidos em memória: {len(self.df_dados)} registros")
+    
     def identificar_registros_sem_categoria(self) -> pd.DataFrame:
         """
         Identifica registros que precisam ser classificados.
@@ -64,12 +158,9 @@ class ClassificadorLLM:
         if self.df_dados is None:
             return pd.DataFrame()
         
-        # Identificar registros sem categoria (vazios ou NaN)
-        mask = (
-            self.df_dados['Categoria'].isna() | 
-            (self.df_dados['Categoria'] == '') |
-            (self.df_dados['Categoria'] == 'nan')
-        )
+        # Identificar registros sem categoria (vazios, NaN ou texto 'nan'/'none')
+        categoria = self.df_dados['Categoria']
+        mask = categoria.isna() | categoria.astype('string').str.strip().str.lower().isin(VALORES_SEM_CATEGORIA)
         
         registros_sem_categoria = self.df_dados[mask].copy()
         
@@ -77,77 +168,182 @@ class ClassificadorLLM:
         
         return registros_sem_categoria
     
-    def classificar_lote(self, registros: pd.DataFrame, lote_size: int = 5) -> List[Dict]:
+    def classificar_lote(self, registros: pd.DataFrame, lote_size: int = 20, concorrencia: int = 4) -> List[Dict]:
         """
-        Classifica um lote de registros usando o LLM.
+        Versão síncrona de classificar_lote_async, para chamadores fora de um event loop.
         
         Args:
             registros: DataFrame com registros para classificar
-            lote_size: Tamanho do lote para processamento
+            lote_size: Quantidade de descrições enviadas em cada requisição ao LLM
+            concorrencia: Número máximo de requisições simultâneas ao LLM
             
         Returns:
             Lista de dicionários com resultados da classificação
         """
+        return asyncio.run(self.classificar_lote_async(registros, lote_size, concorrencia))
+    
+    async def classificar_lote_async(self, registros: pd.DataFrame, lote_size: int = 20, concorrencia: int = 4) -> List[Dict]:
+        """
+        Classifica registros usando o LLM, em lotes enviados concorrentemente.
+        
+        Descrições já presentes no cache (pela forma normalizada) não são enviadas
+        ao LLM, e descrições repetidas são enviadas uma única vez.
+        Cada lote de até lote_size descrições vira uma única requisição ao LLM.
+        As requisições são bloqueantes (I/O de rede), então cada uma roda em
+        uma thread via asyncio.to_thread; o semáforo limita quantas ficam em voo.
+        
+        Args:
+            registros: DataFrame com registros para classificar
+            lote_size: Quantidade de descrições enviadas em cada requisição ao LLM
+            concorrencia: Número máximo de requisições simultâneas ao LLM
+            
+        Returns:
+            Lista de dicionários com resultados da classificação, na ordem dos registros
+        """
+        descricoes = registros['Descricao'].tolist()
+        chaves = [normalizar_descricao(descricao) for descricao in descricoes]
+        
+        # Uma descrição representativa por chave ainda não classificada
+        pendentes = {}
+        for chave, descricao in zip(chaves, descricoes):
+            if chave not in self._cache and chave not in pendentes:
+                pendentes[chave] = descricao
+        
+        # Ordenar por comprimento: cada lote reúne descrições de tamanho parecido
+        itens = sorted(pendentes.items(), key=lambda item: len(str(item[1])))
+        total_lotes = (len(itens) - 1) // lote_size + 1 if itens else 0
+        semaforo = asyncio.Semaphore(concorrencia)
+        limitador = LimitadorTaxa(self.requisicoes_por_minuto, capacidade=concorrencia)
+        
+        print(f"🔄 Iniciando classificação de {len(registros)} registros "
+              f"({len(itens)} descrições distintas fora do cache, {total_lotes} lotes)...")
+        
+        tarefas = [
+            self._classificar_lote_llm(semaforo, limitador, itens[i:i+lote_size], i//lote_size + 1, total_lotes)
+            for i in range(0, len(itens), lote_size)
+        ]
+        
+        respostas = {}
+        for respostas_lote in await asyncio.gather(*tarefas):
+            respostas.update(respostas_lote)
+        
+        # Guardar no cache apenas as classificações bem-sucedidas
+        novas = {chave: categoria for chave, (categoria, _) in respostas.items() if categoria}
+        if novas:
+            self._cache.update(novas)
+            self.salvar_cache()
+        
         resultados = []
-        total_registros = len(registros)
+        for idx, descricao, chave in zip(registros.index, descricoes, chaves):
+            if chave in self._cache:
+                resultados.append(self._montar_resultado(idx, descricao, self._cache[chave], None))
+            else:
+                resultados.append(self._montar_resultado(idx, descricao, None, respostas[chave][1]))
+        
+        return resultados
+    
+    async def _classificar_lote_llm(self, semaforo: asyncio.Semaphore, limitador: LimitadorTaxa, itens: List[Tuple[str, str]],
+                                    numero_lote: int, total_lotes: int) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """
+        Classifica um lote de descrições com uma única requisição ao LLM.
         
-        print(f"🔄 Iniciando classificação de {total_registros} registros...")
+        Args:
+            semaforo: Semáforo que limita as requisições simultâneas
+            limitador: Limitador de taxa de requisições por minuto
+            itens: Pares (chave normalizada, descrição) do lote
+            numero_lote: Posição do lote (para exibição do progresso)
+            total_lotes: Quantidade total de lotes
+            
+        Returns:
+            Dicionário chave → (categoria ou None, mensagem de erro ou None)
+        """
+        descricoes = [descricao for _, descricao in itens]
         
-        for i in range(0, total_registros, lote_size):
-            lote = registros.iloc[i:i+lote_size]
+        async with semaforo:
+            await limitador.aguardar()
+            print(f"   Processando lote {numero_lote}/{total_lotes} ({len(itens)} descrições)")
+            inicio_tempo = time.time()
             
-            print(f"   Processando lote {i//lote_size + 1}/{(total_registros-1)//lote_size + 1} ({len(lote)} registros)")
+            try:
+                categorias = await asyncio.to_thread(self.config_llm.classificar_gastos_lote, descricoes)
+                erro = 'Resposta vazia do LLM'
+            except Exception as e:
+                categorias = [None] * len(descricoes)
+                erro = str(e)
             
-            for idx, row in lote.iterrows():
-                inicio_tempo = time.time()
-                
-                try:
-                    # Classificar usando o LLM
-                    categoria = self.config_llm.classificar_gasto(row['Descricao'])
-                    
-                    if categoria:
-                        resultados.append({
-                            'index': idx,
-                            'descricao': row['Descricao'],
-                            'categoria_original': categoria,
-                            'categoria_limpa': self.limpar_categoria(categoria),
-                            'sucesso': True,
-                            'erro': None
-                        })
-                        self.estatisticas['classificados_com_sucesso'] += 1
-                        print(f"      ✅ '{row['Descricao'][:50]}...' → {categoria}")
-                    else:
-                        resultados.append({
-                            'index': idx,
-                            'descricao': row['Descricao'],
-                            'categoria_original': None,
-                            'categoria_limpa': 'Outros',
-                            'sucesso': False,
-                            'erro': 'Resposta vazia do LLM'
-                        })
-                        self.estatisticas['erros'] += 1
-                        print(f"      ❌ '{row['Descricao'][:50]}...' → Erro: resposta vazia")
-                    
-                    self.estatisticas['total_processados'] += 1
-                    self.estatisticas['tempo_total'] += time.time() - inicio_tempo
-                    
-                    # Pequena pausa para não sobrecarregar a API
-                    time.sleep(0.5)
-                    
-                except Exception as e:
-                    resultados.append({
-                        'index': idx,
-                        'descricao': row['Descricao'],
-                        'categoria_original': None,
-                        'categoria_limpa': 'Outros',
-                        'sucesso': False,
-                        'erro': str(e)
-                    })
-                    self.estatisticas['erros'] += 1
-                    self.estatisticas['total_processados'] += 1
-                    print(f"      ❌ '{row['Descricao'][:50]}...' → Erro: {e}")
+            self.estatisticas['tempo_total'] += time.time() - inicio_tempo
         
-        return resultados
+        return {
+            chave: (categoria, None if categoria else erro)
+            for (chave, _), categoria in zip(itens, categorias)
+        }
+    
+    def _montar_resultado(self, idx, descricao: str, categoria: Optional[str], erro: Optional[str]) -> Dict:
+        """
+        Monta o resultado da classificação de um registro e atualiza as estatísticas.
+        
+        Args:
+            idx: Índice do registro no DataFrame
+            descricao: Descrição do gasto
+            categoria: Categoria retornada pelo LLM (ou do cache), None em caso de erro
+            erro: Mensagem de erro quando não há categoria
+            
+        Returns:
+            Dicionário com o resultado da classificação
+        """
+        self.estatisticas['total_processados'] += 1
+        
+        if categoria:
+            self.estatisticas['classificados_com_sucesso'] += 1
+            if self.verbose:
+                print(f"      ✅ '{descricao[:50]}...' → {categoria}")
+            return {
+                'index': idx,
+                'descricao': descricao,
+                'categoria_original': categoria,
+                'categoria_limpa': self.limpar_categoria(categoria),
+                'sucesso': True,
+                'erro': None
+            }
+        
+        self.estatisticas['erros'] += 1
+        if self.verbose:
+            print(f"      ❌ '{descricao[:50]}...' → Erro: {erro}")
+        return {
+            'index': idx,
+            'descricao': descricao,
+            'categoria_original': None,
+            'categoria_limpa': 'Outros',
+            'sucesso': False,
+            'erro': erro
+        }
+    
+    def carregar_cache(self) -> Dict[str, str]:
+        """
+        Carrega o cache de classificações (descrição normalizada → categoria).
+        
+        Returns:
+            Dicionário com as classificações já conhecidas
+        """
+        if not os.path.exists(self.arquivo_cache):
+            return {}
+        
+        try:
+            with open(self.arquivo_cache, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️  Erro ao carregar cache de classificações: {e}")
+            return {}
+    
+    def salvar_cache(self):
+        """Salva o cache de classificações de forma atômica (arquivo temporário + os.replace)."""
+        try:
+            pasta = os.path.dirname(self.arquivo_cache) or "."
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=pasta, suffix='.tmp', delete=False) as f:
+                json.dump(self._cache, f, ensure_ascii=False, indent=2)
+            os.replace(f.name, self.arquivo_cache)
+        except Exception as e:
+            print(f"⚠️  Erro ao salvar cache de classificações: {e}")
     
     def limpar_categoria(self, categoria: str) -> str:
         """
@@ -159,48 +355,38 @@ class ClassificadorLLM:
         Returns:
             Categoria limpa e padronizada
         """
-        if not categoria:
-            return 'Outros'
-        
-        # Limpar e padronizar
-        categoria_limpa = categoria.strip().title()
-        
-        # Mapear variações para categorias padrão
-        mapeamento = {
-            'Alimentacao': 'Alimentação',
-            'Educacao': 'Educação',
-            'Saude': 'Saúde',
-            'Servicos': 'Serviços',
-            'Investimento': 'Investimentos',
-            'Outro': 'Outros',
-            'Other': 'Outros'
-        }
-        
-        return mapeamento.get(categoria_limpa, categoria_limpa)
+        return limpar_categoria(categoria)
     
-    def aplicar_classificacoes(self, resultados: List[Dict]) -> bool:
+    def aplicar_classificacoes(self, resultados: List[Dict], salvar: bool = True) -> bool:
         """
         Aplica as classificações ao banco de dados.
         
         Args:
             resultados: Lista com resultados da classificação
+            salvar: Grava o banco no disco; False quando quem forneceu os dados
+                    (definir_dados) grava depois
             
         Returns:
             True se aplicado com sucesso, False caso contrário.
         """
         try:
+            if not resultados:
+                print("ℹ️  Nenhuma classificação para aplicar")
+                return True
+            
             print("💾 Aplicando classificações ao banco de dados...")
             
-            # Aplicar cada classificação
-            for resultado in resultados:
-                idx = resultado['index']
-                categoria = resultado['categoria_limpa']
-                
-                # Atualizar a categoria no DataFrame
-                self.df_dados.at[idx, 'Categoria'] = categoria
+            # Atualizar todas as categorias de uma vez (atribuição vetorizada)
+            indices = np.fromiter((resultado['index'] for resultado in resultados), dtype=np.int64, count=len(resultados))
+            categorias = np.array([resultado['categoria_limpa'] for resultado in resultados], dtype=object)
+            self.df_dados.loc[indices, 'Categoria'] = categorias
             
             # Salvar o arquivo atualizado
-            self.df_dados.to_excel(self.arquivo_bd, index=False, engine='openpyxl')
+            if not salvar:
+                print(f"✅ {len(resultados)} classificações aplicadas")
+                return True
+            
+            salvar_gastos(self.df_dados, self.arquivo_bd)
             
             print(f"✅ {len(resultados)} classificações aplicadas e salvas")
             return True
@@ -251,10 +437,13 @@ class ClassificadorLLM:
         
         print("="*60)
     
-    def executar_classificacao_completa(self) -> bool:
+    def executar_classificacao_completa(self, salvar: bool = True) -> bool:
         """
         Executa o processo completo de classificação.
         
+        Args:
+            salvar: Grava o banco ao aplicar as classificações (ver aplicar_classificacoes)
+            
         Returns:
             True se executado com sucesso, False caso contrário.
         """
@@ -264,8 +453,8 @@ class ClassificadorLLM:
         if not self.inicializar_llm():
             return False
         
-        # Carregar dados
-        if not self.carregar_dados():
+        # Carregar dados (a menos que já tenham sido definidos em memória)
+        if self.df_dados is None and not self.carregar_dados():
             return False
         
         # Identificar registros sem categoria
@@ -275,11 +464,11 @@ class ClassificadorLLM:
             print("✅ Todos os registros já estão classificados!")
             return True
         
-        # Classificar registros
-        resultados = self.classificar_lote(registros_sem_categoria)
+        # Classificar registros (chamadas concorrentes ao LLM)
+        resultados = asyncio.run(self.classificar_lote_async(registros_sem_categoria))
         
         # Aplicar classificações
-        if not self.aplicar_classificacoes(resultados):
+        if not self.aplicar_classificacoes(resultados, salvar=salvar):
             return False
         
         # Gerar relatório
@@ -5,12 +5,196 @@ Configura e testa a conexão com Gemini 2.5 Flash via OpenAI client.
 """
 
 import os
-from openai import OpenAI
-from typing import Optional, Dict, Any
+import bisect
+import logging
+import re
+import ssl
+from enum import IntEnum
+import certifi
+import httpx
+import orjson
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+# Linha de resposta numerada: "1: Alimentação", "2. Transporte", "3 - Outros"
+PADRAO_LINHA_NUMERADA = re.compile(r'^\s*(\d+)\s*[:.)\-]\s*(.+?)\s*$')
+
+# Pool de conexões HTTP compartilhado pelas chamadas ao LLM
+LIMITES_HTTP = httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30.0)
+TIMEOUT_HTTP = httpx.Timeout(60.0, connect=10.0)
+
+# Tentativas em falhas transitórias: o transporte do httpx refaz conexões que
+# falharam ao abrir e o SDK repete respostas 408/409/429/5xx com backoff
+# exponencial (respeitando Retry-After), sempre sobre o mesmo pool de conexões
+TENTATIVAS_CONEXAO = 3
+TENTATIVAS_API = 3
+
+# Contexto SSL criado uma única vez no processo (com os certificados do certifi,
+# como o httpx faz por padrão): evita reler os certificados a cada novo cliente
+CONTEXTO_SSL = ssl.create_default_context(cafile=certifi.where())
+
+# Variáveis de ambiente da API, lidas uma vez na importação do módulo
+_API_KEY = os.environ.get('OPENAI_API_KEY')
+_BASE_URL = os.environ.get('OPENAI_BASE_URL')
+
+def recarregar_variaveis_ambiente():
+    """Relê OPENAI_API_KEY e OPENAI_BASE_URL (ex.: após alterá-las em tempo de execução)."""
+    global _API_KEY, _BASE_URL
+    _API_KEY = os.environ.get('OPENAI_API_KEY')
+    _BASE_URL = os.environ.get('OPENAI_BASE_URL')
+
+# Sufixo de país que os bancos acrescentam às descrições ("... SAO PAULO BRA")
+PADRAO_SUFIXO_PAIS = re.compile(r'\s+BRA$')
+
+def normalizar_descricao(descricao: str) -> str:
+    """
+    Normaliza a descrição de um gasto para uso como chave de cache.
+    
+    Remove números (datas, parcelas, códigos), o sufixo de país e espaços
+    repetidos, de forma que variações do mesmo estabelecimento compartilhem
+    a mesma classificação.
+    
+    Args:
+        descricao: Descrição original do gasto
+        
+    Returns:
+        Descrição normalizada
+    """
+    descricao = ' '.join(re.sub(r'\d+', ' ', str(descricao).upper()).split())
+    return PADRAO_SUFIXO_PAIS.sub('', descricao)
+
+# Estabelecimentos óbvios classificados sem consultar o LLM (regra → categoria).
+# Todas as regras viram uma única expressão regular com grupos nomeados.
+REGRAS_CATEGORIAS = {
+    'Alimentação': r'IFOOD|RAPPI|UBER\s*EATS|MC\s*DONALDS|MCDONALDS|BURGER\s*KING|ZE\s*DELIVERY|PADARIA|RESTAURANTE|SUPERMERCADO',
+    'Transporte': r'POSTO|SHELL|IPIRANGA|BR\s*MANIA|UBER(?!\s*EATS)|99\s*(?:TAXI|POP)|ESTACIONAMENTO|PEDAGIO|SEM\s*PARAR',
+    'Saúde': r'DROGA\s*RAIA|DROGASIL|DROGARIA|FARMACIA|PAGUE\s*MENOS',
+    'Lazer': r'NETFLIX|SPOTIFY|CINEMA|DISNEY\s*PLUS|HBO\s*MAX|PRIME\s*VIDEO',
+}
+_GRUPOS_REGRAS = {f"r{i}": categoria for i, categoria in enumerate(REGRAS_CATEGORIAS)}
+PADRAO_REGRAS = re.compile(
+    '|'.join(rf'\b(?P<{grupo}>{REGRAS_CATEGORIAS[categoria]})\b' for grupo, categoria in _GRUPOS_REGRAS.items()),
+    re.IGNORECASE
+)
+
+def classificar_por_regras(descricao: str) -> Optional[str]:
+    """
+    Classifica a descrição pelas regras de estabelecimentos conhecidos.
+    
+    Args:
+        descricao: Descrição do gasto
+        
+    Returns:
+        Categoria encontrada ou None se nenhuma regra se aplicar
+    """
+    match = PADRAO_REGRAS.search(str(descricao))
+    return _GRUPOS_REGRAS[match.lastgroup] if match else None
+
+class Categoria(IntEnum):
+    """Categorias de gasto aceitas, com código inteiro fixo (índice em NOMES_CATEGORIAS)."""
+    ALIMENTACAO = 0
+    TRANSPORTE = 1
+    MORADIA = 2
+    SAUDE = 3
+    EDUCACAO = 4
+    LAZER = 5
+    COMPRAS = 6
+    SERVICOS = 7
+    INVESTIMENTOS = 8
+    OUTROS = 9
+    
+    @property
+    def nome(self) -> str:
+        """Nome da categoria como aparece no banco de dados."""
+        return NOMES_CATEGORIAS[self]
+
+NOMES_CATEGORIAS = (
+    'Alimentação', 'Transporte', 'Moradia', 'Saúde', 'Educação',
+    'Lazer', 'Compras', 'Serviços', 'Investimentos', 'Outros'
+)
+_ID_POR_NOME = {nome: Categoria(i) for i, nome in enumerate(NOMES_CATEGORIAS)}
+
+def categoria_para_id(nome: Optional[str]) -> Categoria:
+    """
+    Converte o nome de categoria retornado pelo LLM no código da categoria.
+    
+    Args:
+        nome: Nome da categoria (None ou nomes desconhecidos viram OUTROS)
+        
+    Returns:
+        Categoria correspondente
+    """
+    if not nome:
+        return Categoria.OUTROS
+    return _ID_POR_NOME.get(nome.strip(), Categoria.OUTROS)
+
+# Limites de comprimento das faixas usadas para agrupar descrições nos lotes:
+# [0, 30), [30, 60), [60, 120) e [120, ∞)
+FAIXAS_COMPRIMENTO = (30, 60, 120)
+
+# Instruções fixas da classificação individual; a descrição vai na mensagem do usuário
+PROMPT_SISTEMA_CLASSIFICACAO = """Você é um assistente especializado em classificação de gastos pessoais.
+
+Classifique o gasto informado pelo usuário em UMA das categorias abaixo:
+
+CATEGORIAS DISPONÍVEIS:
+- Alimentação
+- Transporte
+- Moradia
+- Saúde
+- Educação
+- Lazer
+- Compras
+- Serviços
+- Investimentos
+- Outros
+
+INSTRUÇÕES:
+- Responda APENAS com o objeto JSON {"c": "<categoria>"}
+- Use exatamente um dos nomes listados acima
+- Não adicione explicações ou comentários"""
+
+# Saída estruturada da classificação individual: o modelo só pode responder
+# {"c": "<uma das categorias>"}, dispensando limpeza do texto da resposta
+FORMATO_RESPOSTA_CLASSIFICACAO = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "categoria",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"c": {"type": "string", "enum": list(NOMES_CATEGORIAS)}},
+            "required": ["c"],
+            "additionalProperties": False
+        }
+    }
+}
+
+def conteudo_resposta(resposta_bruta) -> Optional[str]:
+    """
+    Extrai o texto da resposta bruta (with_raw_response) do chat completions.
+    
+    Lê o corpo JSON direto com orjson, sem montar os modelos pydantic do SDK.
+    
+    Args:
+        resposta_bruta: Resposta retornada por chat.completions.with_raw_response.create
+        
+    Returns:
+        Conteúdo da primeira escolha (None se a API não retornou texto)
+    """
+    return orjson.loads(resposta_bruta.content)["choices"][0]["message"]["content"]
 
 class ConfigLLM:
-    def __init__(self):
+    def __init__(self, cache: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            cache: Dicionário descrição normalizada → categoria, compartilhado com
+                   quem persiste o cache (ex.: ClassificadorLLM); um novo se omitido
+        """
+        self.cache_classificacoes = cache if cache is not None else {}
         self.client = None
+        self._http = None
         self.modelo = "gpt-4.1-mini"  # Modelo disponível via proxy Manus
         self.configurado = False
     
@@ -23,27 +207,42 @@ class ConfigLLM:
         """
         try:
             # As variáveis de ambiente já estão configuradas
-            api_key = os.getenv('OPENAI_API_KEY')
-            base_url = os.getenv('OPENAI_BASE_URL')
-            
-            if not api_key or not base_url:
-                print("❌ Configuração da API não encontrada nas variáveis de ambiente")
+            if not _API_KEY or not _BASE_URL:
+                logger.error("Configuração da API não encontrada nas variáveis de ambiente")
                 return False
             
-            # Criar cliente OpenAI configurado para o proxy Manus
-            self.client = OpenAI()  # Usa automaticamente as variáveis de ambiente
+            # Importado só aqui: o pacote openai é pesado e só é necessário ao criar o cliente
+            from openai import OpenAI
             
-            print("✅ Cliente LLM configurado com sucesso")
-            print(f"   Modelo: {self.modelo}")
-            print(f"   Endpoint: {base_url}")
+            # Criar cliente OpenAI configurado para o proxy Manus, com pool de
+            # conexões persistentes (keep-alive) reaproveitado entre as chamadas
+            self.close()
+            transporte = httpx.HTTPTransport(verify=CONTEXTO_SSL, limits=LIMITES_HTTP, retries=TENTATIVAS_CONEXAO)
+            self._http = httpx.Client(transport=transporte, timeout=TIMEOUT_HTTP)
+            self.client = OpenAI(api_key=_API_KEY, base_url=_BASE_URL, http_client=self._http,
+                                 max_retries=TENTATIVAS_API)
+            
+            logger.info("Cliente LLM configurado (modelo: %s, endpoint: %s)", self.modelo, _BASE_URL)
             
             self.configurado = True
             return True
             
         except Exception as e:
-            print(f"❌ Erro ao configurar cliente: {e}")
+            logger.error("Erro ao configurar cliente: %s", e)
             return False
     
+    def close(self):
+        """Fecha as conexões HTTP do cliente."""
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
     def testar_conexao(self) -> bool:
         """
         Testa a conexão com a API fazendo uma requisição simples.
@@ -52,11 +251,11 @@ class ConfigLLM:
             True se o teste passou, False caso contrário.
         """
         if not self.configurado:
-            print("❌ LLM não configurado. Execute configurar_cliente() primeiro.")
+            logger.error("LLM não configurado. Execute configurar_cliente() primeiro.")
             return False
         
         try:
-            print("🔄 Testando conexão com a API...")
+            logger.info("Testando conexão com a API...")
             
             # Fazer uma requisição simples de teste
             response = self.client.chat.completions.create(
@@ -70,15 +269,14 @@ class ConfigLLM:
             
             if response and response.choices and response.choices[0].message.content:
                 resposta = response.choices[0].message.content.strip()
-                print(f"✅ Teste de conexão bem-sucedido")
-                print(f"   Resposta: {resposta}")
+                logger.info("Teste de conexão bem-sucedido (resposta: %s)", resposta)
                 return True
             else:
-                print("❌ Resposta vazia da API")
+                logger.error("Resposta vazia da API")
                 return False
                 
         except Exception as e:
-            print(f"❌ Erro no teste de conexão: {e}")
+            logger.error("Erro no teste de conexão: %s", e)
             return False
     
     def classificar_gasto(self, descricao: str) -> Optional[str]:
@@ -92,14 +290,110 @@ class ConfigLLM:
             Categoria classificada ou None em caso de erro
         """
         if not self.configurado:
-            print("❌ LLM não configurado")
             return None
         
+        categoria = classificar_por_regras(descricao)
+        if categoria:
+            return categoria
+        
+        chave = normalizar_descricao(descricao)
+        if chave in self.cache_classificacoes:
+            return self.cache_classificacoes[chave]
+        
         try:
-            # Prompt para classificação de gastos
-            prompt = f"""Você é um assistente especializado em classificação de gastos pessoais.
+            response = self.client.chat.completions.with_raw_response.create(
+                model=self.modelo,
+                messages=self._mensagens_classificacao(descricao),
+                response_format=FORMATO_RESPOSTA_CLASSIFICACAO,
+                max_tokens=12,
+                temperature=0,
+                stream=False
+            )
+            categoria = orjson.loads(conteudo_resposta(response))["c"]
+            
+        except (IndexError, KeyError, TypeError, orjson.JSONDecodeError):
+            # Resposta sem conteúdo ou fora do formato
+            return None
+        except Exception as e:
+            logger.debug("Erro na classificação de %r: %s", descricao, e)
+            return None
+        
+        if not categoria:
+            return None
+        self.cache_classificacoes[chave] = categoria
+        return categoria
+    
+    def _mensagens_classificacao(self, descricao: str) -> List[Dict[str, str]]:
+        """
+        Monta as mensagens do prompt de classificação de um gasto.
+        
+        As instruções fixas vão na mensagem de sistema (PROMPT_SISTEMA_CLASSIFICACAO,
+        idêntica em todas as chamadas e elegível ao cache de prompt do provedor);
+        só a descrição vai na mensagem do usuário.
+        
+        Args:
+            descricao: Descrição do gasto para classificar
+            
+        Returns:
+            Lista de mensagens no formato da API de chat
+        """
+        return [
+            {"role": "system", "content": PROMPT_SISTEMA_CLASSIFICACAO},
+            {"role": "user", "content": str(descricao)}
+        ]
+    
+    def classificar_gastos_lote(self, descricoes: List[str], tamanho_lote: int = 50) -> List[Optional[str]]:
+        """
+        Classifica vários gastos agrupando até tamanho_lote descrições por requisição ao LLM.
+        
+        Descrições cobertas por REGRAS_CATEGORIAS são resolvidas localmente; as
+        demais são agrupadas por faixa de comprimento antes de formar os lotes.
+        
+        Args:
+            descricoes: Descrições dos gastos para classificar
+            tamanho_lote: Número máximo de descrições por requisição
+            
+        Returns:
+            Categorias na mesma ordem das descrições (None para itens com erro)
+        """
+        if not self.configurado:
+            logger.error("LLM não configurado")
+            return [None] * len(descricoes)
+        
+        # Regras resolvem os estabelecimentos conhecidos; só o restante vai ao LLM
+        categorias = [classificar_por_regras(descricao) for descricao in descricoes]
+        
+        # Descrições de comprimento parecido vão juntas (faixas de FAIXAS_COMPRIMENTO),
+        # para que itens curtos não dividam lote com descrições muito longas
+        faixas = [[] for _ in range(len(FAIXAS_COMPRIMENTO) + 1)]
+        for i, categoria in enumerate(categorias):
+            if categoria is None:
+                faixas[bisect.bisect_right(FAIXAS_COMPRIMENTO, len(str(descricoes[i])))].append(i)
+        
+        for posicoes_faixa in faixas:
+            for inicio in range(0, len(posicoes_faixa), tamanho_lote):
+                posicoes_lote = posicoes_faixa[inicio:inicio+tamanho_lote]
+                respostas = self._classificar_lote_unico([descricoes[i] for i in posicoes_lote])
+                for posicao, categoria in zip(posicoes_lote, respostas):
+                    categorias[posicao] = categoria
+        
+        return categorias
+    
+    def _classificar_lote_unico(self, descricoes: List[str]) -> List[Optional[str]]:
+        """
+        Classifica vários gastos em uma única requisição ao LLM.
+        
+        Args:
+            descricoes: Descrições dos gastos para classificar
+            
+        Returns:
+            Categorias na mesma ordem das descrições (None para itens com erro)
+        """
+        itens = "\n".join(f"{i}. {descricao}" for i, descricao in enumerate(descricoes, 1))
+        
+        prompt = f"""Você é um assistente especializado em classificação de gastos pessoais.
 
-Classifique o gasto a seguir em UMA das categorias abaixo:
+Classifique CADA gasto da lista a seguir em UMA das categorias abaixo:
 
 CATEGORIAS DISPONÍVEIS:
 - Alimentação
@@ -113,33 +407,103 @@ CATEGORIAS DISPONÍVEIS:
 - Investimentos
 - Outros
 
-DESCRIÇÃO DO GASTO: {descricao}
+GASTOS:
+{itens}
 
 INSTRUÇÕES:
-- Responda APENAS com o nome da categoria
+- Responda APENAS com um array JSON contendo {len(descricoes)} strings
+- Cada string é a categoria do gasto de mesmo número, na mesma ordem da lista
 - Use exatamente um dos nomes listados acima
 - Não adicione explicações ou comentários
 
-CATEGORIA:"""
+Exemplo de resposta para 3 gastos: ["Alimentação", "Transporte", "Outros"]"""
 
-            response = self.client.chat.completions.create(
+        try:
+            response = self.client.chat.completions.with_raw_response.create(
                 model=self.modelo,
                 messages=[
                     {"role": "user", "content": prompt}
                 ],
-                max_tokens=20,
+                max_tokens=20 + 10 * len(descricoes),
                 temperature=0
             )
             
-            if response and response.choices and response.choices[0].message.content:
-                categoria = response.choices[0].message.content.strip()
-                return categoria
-            else:
-                return None
-                
+            conteudo = conteudo_resposta(response)
+            
         except Exception as e:
-            print(f"❌ Erro na classificação: {e}")
+            logger.error("Erro na classificação em lote de %d gastos: %s", len(descricoes), e)
+            return [None] * len(descricoes)
+        
+        categorias = self._interpretar_resposta_lote(conteudo, len(descricoes))
+        if categorias is not None:
+            return categorias
+        
+        # Resposta fora do formato esperado: classificar item a item
+        logger.warning("Resposta em lote inválida, classificando %d gastos individualmente", len(descricoes))
+        categorias = [self.classificar_gasto(descricao) for descricao in descricoes]
+        falhas = categorias.count(None)
+        if falhas:
+            logger.error("%d de %d gastos não puderam ser classificados", falhas, len(descricoes))
+        return categorias
+    
+    def _interpretar_resposta_lote(self, conteudo: Optional[str], quantidade: int) -> Optional[List[Optional[str]]]:
+        """
+        Converte a resposta do LLM em lista de categorias.
+        
+        Aceita o array JSON pedido no prompt e, como alternativa, uma categoria
+        por linha no formato numerado "1: Categoria" / "1. Categoria".
+        
+        Args:
+            conteudo: Texto retornado pelo LLM
+            quantidade: Número de categorias esperado
+            
+        Returns:
+            Lista de categorias ou None se a resposta não estiver em nenhum formato esperado
+        """
+        if not conteudo:
+            return None
+        
+        texto = conteudo.strip()
+        
+        # Alguns modelos envolvem o JSON em bloco de código markdown
+        if texto.startswith("```"):
+            texto = texto.strip("`")
+            if texto.lower().startswith("json"):
+                texto = texto[4:]
+        
+        try:
+            categorias = orjson.loads(texto)
+        except orjson.JSONDecodeError:
+            return self._interpretar_linhas_numeradas(texto, quantidade)
+        
+        if not isinstance(categorias, list) or len(categorias) != quantidade:
             return None
+        
+        return [str(categoria).strip() or None if categoria else None for categoria in categorias]
+    
+    def _interpretar_linhas_numeradas(self, texto: str, quantidade: int) -> Optional[List[Optional[str]]]:
+        """
+        Interpreta respostas no formato "i: Categoria", uma por linha.
+        
+        Args:
+            texto: Texto retornado pelo LLM
+            quantidade: Número de categorias esperado
+            
+        Returns:
+            Lista de categorias (None para números ausentes) ou None se nenhuma linha casar
+        """
+        categorias = [None] * quantidade
+        encontrou = False
+        
+        for linha in texto.splitlines():
+            match = PADRAO_LINHA_NUMERADA.match(linha)
+            if match:
+                posicao = int(match.group(1))
+                if 1 <= posicao <= quantidade:
+                    categorias[posicao - 1] = match.group(2).strip('"\' ') or None
+                    encontrou = True
+        
+        return categorias if encontrou else None
     
     def obter_configuracao(self) -> Dict[str, Any]:
         """
@@ -152,12 +516,21 @@ CATEGORIA:"""
             'configurado': self.configurado,
             'cliente_inicializado': bool(self.client),
             'modelo': self.modelo,
-            'api_key_definida': bool(os.getenv('OPENAI_API_KEY')),
-            'base_url': os.getenv('OPENAI_BASE_URL')
+            'api_key_definida': bool(_API_KEY),
+            'base_url': _BASE_URL
         }
 
+# Descrições usadas no teste de classificação do main()
+_TEST_EXAMPLES = (
+    "APPLE COM BILL SAO PAULO BRA",
+    "99Food IFOOD CLUB Osasco BRA",
+    "POSTO SHELL COMBUSTIVEL",
+    "FARMACIA DROGA RAIA"
+)
+
 def main():
     """Função principal para teste e configuração inicial."""
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("=== CONFIGURAÇÃO DO LLM (GEMINI 2.5 FLASH) ===")
     
     config = ConfigLLM()
@@ -173,15 +546,9 @@ def main():
     # Teste de classificação
     print("\n🧪 Testando classificação de gastos...")
     
-    exemplos_teste = [
-        "APPLE COM BILL SAO PAULO BRA",
-        "99Food IFOOD CLUB Osasco BRA", 
-        "POSTO SHELL COMBUSTIVEL",
-        "FARMACIA DROGA RAIA"
-    ]
-    
-    for exemplo in exemplos_teste:
-        categoria = config.classificar_gasto(exemplo)
+    # Um único lote: no máximo uma requisição ao LLM para todos os exemplos
+    categorias = config.classificar_gastos_lote(list(_TEST_EXAMPLES))
+    for exemplo, categoria in zip(_TEST_EXAMPLES, categorias):
         print(f"   '{exemplo}' → {categoria}")
     
     # Exibir configuração final
@@ -4,8 +4,8 @@ Script para criar o arquivo inicial gastos.xlsx com a estrutura definida.
 Parte do Sistema de Controle de Gastos Pessoais.
 """
 
-import pandas as pd
 import os
+from openpyxl import Workbook
 
 def criar_arquivo_base():
     """Cria o arquivo gastos.xlsx com o cabeçalho estruturado."""
@@ -29,11 +29,14 @@ def criar_arquivo_base():
         'Observacoes'     # Campo livre para anotações manuais
     ]
     
-    # Criar DataFrame vazio com as colunas definidas
-    df = pd.DataFrame(columns=colunas)
+    # Criar planilha apenas com o cabeçalho (sem passar pelo pandas), em modo
+    # write_only: as linhas são gravadas em fluxo, com memória constante
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(colunas)
     
     # Salvar o arquivo Excel
-    df.to_excel(caminho_arquivo, index=False, engine='openpyxl')
+    wb.save(caminho_arquivo)
     
     print(f"Arquivo {caminho_arquivo} criado com sucesso!")
     print(f"Estrutura das colunas: {', '.join(colunas)}")
@@ -9,10 +9,11 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import os
 import numpy as np
-from insights_llm import InsightsLLM
+from armazenamento import ARQUIVO_BD_PADRAO, arquivo_banco, banco_existe, carregar_gastos
 
 # Configuração da página
 st.set_page_config(
@@ -22,25 +23,141 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Colunas do banco de dados usadas pelo dashboard (as demais nem são lidas)
+COLUNAS_DASHBOARD = ['Data', 'Descricao', 'Valor', 'Categoria', 'Origem']
+
+# Valores de seleção que significam "sem filtro"
+VALORES_SEM_FILTRO = frozenset({None, '', 'Todas', 'Todos'})
+
+# Linhas enviadas ao navegador na tabela de detalhes (ajustável na própria aba)
+LIMITE_LINHAS_TABELA = 1000
+
+# Número aproximado de pontos da timeline (≈ largura do gráfico em pixels):
+# períodos longos são agregados em intervalos de vários dias até caber nisso
+PONTOS_TIMELINE = 800
+
+# Dias da semana na ordem de exibição (categorias ordenadas da coluna Dia_Semana)
+DIAS_SEMANA = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+def valores_float(df: pd.DataFrame) -> np.ndarray:
+    """Coluna Valor como array numpy float64 (NA vira NaN), seja qual for o dtype gravado."""
+    return df['Valor'].to_numpy(dtype='float64', na_value=np.nan)
+
+@st.cache_data(show_spinner=False)
+def carregar_dados_dashboard(arquivo_dados: str, mtime: float) -> pd.DataFrame:
+    """
+    Carrega o banco de dados e deriva as colunas usadas pelos gráficos.
+    
+    Fica em cache entre as reexecuções do Streamlit (cada interação com um
+    widget); mtime faz parte da chave, então o cache expira quando o arquivo muda.
+    
+    Args:
+        arquivo_dados: Caminho do banco de dados
+        mtime: Data de modificação do arquivo lido
+    
+    Returns:
+        DataFrame com Data convertida e colunas derivadas
+    """
+    df = carregar_gastos(arquivo_dados, colunas=COLUNAS_DASHBOARD)
+    # Converter coluna de data para datetime
+    df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
+    # Adicionar colunas derivadas (calculadas uma vez aqui, não a cada gráfico)
+    df['Data_Dia'] = df['Data'].dt.normalize()
+    df['Dia_Semana'] = pd.Categorical(df['Data'].dt.day_name(), categories=DIAS_SEMANA, ordered=True)
+    df['Mes'] = df['Data'].dt.month
+    df['Ano'] = df['Data'].dt.year
+    df['Dia_Mes'] = df['Data'].dt.day
+    
+    # Colunas de agrupamento/filtro como category: códigos inteiros em vez de strings
+    # (groupby com observed=True para não listar categorias ausentes no filtro)
+    df['Categoria'] = df['Categoria'].astype('category')
+    df['Origem'] = df['Origem'].astype('category')
+    return df
+
+@st.cache_data(show_spinner=False)
+def carregar_opcoes_filtros(arquivo_dados: str, mtime: float) -> dict:
+    """
+    Calcula as opções dos filtros da sidebar (uma vez por versão do arquivo).
+    
+    As listas de categorias e bancos vêm das categorias (já ordenadas) das
+    colunas category; o período vem do mínimo e máximo da coluna Data.
+    
+    Args:
+        arquivo_dados: Caminho do banco de dados
+        mtime: Data de modificação do arquivo lido
+    
+    Returns:
+        Dicionário com 'categorias', 'bancos', 'data_min' e 'data_max'
+    """
+    df = carregar_dados_dashboard(arquivo_dados, mtime)
+    return {
+        'categorias': ['Todas'] + list(df['Categoria'].cat.categories),
+        'bancos': ['Todos'] + list(df['Origem'].cat.categories),
+        'data_min': df['Data'].min().date(),
+        'data_max': df['Data'].max().date()
+    }
+
+@st.cache_data(show_spinner=False, max_entries=100)
+def figura_em_cache(nome_grafico: str, chave: tuple, _construir):
+    """
+    Retorna a figura de um gráfico, construindo-a só quando a chave muda.
+    
+    Todas as abas executam a cada interação; com o cache, mexer em um widget
+    (ex.: o slider do ranking) não reconstrói os gráficos que não dependem dele.
+    _construir não entra no hash (prefixo _), só nome_grafico e chave.
+    
+    Args:
+        nome_grafico: Identificador do gráfico
+        chave: Arquivo, mtime e filtros (mais parâmetros próprios do gráfico)
+        _construir: Função sem argumentos que cria a figura
+    
+    Returns:
+        Figura(s) do plotly retornada(s) por _construir (None se não houver dados)
+    """
+    return _construir()
+
+@st.cache_resource(show_spinner=False)
+def obter_insights_llm(arquivo_dados: str):
+    """Retorna o gerador de insights, criado uma vez por processo do Streamlit."""
+    # Importado aqui: o módulo (e o cliente do LLM) só é carregado quando a aba de IA é usada
+    from insights_llm import InsightsLLM
+    return InsightsLLM(arquivo_dados)
+
+# Estilo das abas, injetado no topo da página
+CSS_DASHBOARD = """
+<style>
+.stTabs [data-baseweb="tab-list"] {
+    gap: 2px;
+}
+.stTabs [data-baseweb="tab"] {
+    height: 50px;
+    padding-left: 20px;
+    padding-right: 20px;
+}
+</style>
+"""
+
 class DashboardGastos:
-    def __init__(self, arquivo_dados: str = "../data/gastos.xlsx"):
+    def __init__(self, arquivo_dados: str = ARQUIVO_BD_PADRAO):
         self.arquivo_dados = arquivo_dados
         self.df = None
-        self.insights_generator = InsightsLLM(arquivo_dados)
+        self.mtime = None
+        self.opcoes_filtros = None
         self.carregar_dados()
     
+    @property
+    def insights_generator(self):
+        """Gerador de insights com LLM, criado só no primeiro uso (botão da aba de IA)."""
+        return obter_insights_llm(self.arquivo_dados)
+    
     def carregar_dados(self):
-        """Carrega os dados do arquivo Excel."""
+        """Carrega os dados do banco de dados."""
         try:
-            if os.path.exists(self.arquivo_dados):
-                self.df = pd.read_excel(self.arquivo_dados, engine='openpyxl')
-                # Converter coluna de data para datetime
-                self.df['Data'] = pd.to_datetime(self.df['Data'], format='%d/%m/%Y', errors='coerce')
-                # Adicionar colunas derivadas
-                self.df['Dia_Semana'] = self.df['Data'].dt.day_name()
-                self.df['Mes'] = self.df['Data'].dt.month
-                self.df['Ano'] = self.df['Data'].dt.year
-                self.df['Dia_Mes'] = self.df['Data'].dt.day
+            if banco_existe(self.arquivo_dados):
+                self.mtime = os.path.getmtime(arquivo_banco(self.arquivo_dados))
+                self.df = carregar_dados_dashboard(self.arquivo_dados, self.mtime)
+                if not self.df.empty:
+                    self.opcoes_filtros = carregar_opcoes_filtros(self.arquivo_dados, self.mtime)
                 return True
             else:
                 st.error(f"Arquivo de dados não encontrado: {self.arquivo_dados}")
@@ -49,25 +166,49 @@ class DashboardGastos:
             st.error(f"Erro ao carregar dados: {e}")
             return False
     
+    def chave_graficos(self, filtros):
+        """Chave de cache das figuras: versão do arquivo mais os filtros aplicados."""
+        return (self.arquivo_dados, self.mtime, tuple(sorted(filtros.items())))
+    
     def aplicar_filtros(self, df, filtros):
-        """Aplica filtros ao DataFrame."""
-        df_filtrado = df.copy()
+        """
+        Aplica filtros ao DataFrame.
         
-        if filtros.get('categoria') and filtros['categoria'] != 'Todas':
-            df_filtrado = df_filtrado[df_filtrado['Categoria'] == filtros['categoria']]
+        Todos os filtros são combinados em uma única máscara booleana e o
+        DataFrame é fatiado uma só vez, sem cópias intermediárias. As comparações
+        viram arrays numpy bool/float64 (NA conta como False), independentemente
+        do dtype com que as colunas foram gravadas.
+        """
+        mascara = np.ones(len(df), dtype=bool)
         
-        if filtros.get('banco') and filtros['banco'] != 'Todos':
-            df_filtrado = df_filtrado[df_filtrado['Origem'] == filtros['banco']]
+        if filtros.get('categoria') not in VALORES_SEM_FILTRO:
+            mascara &= (df['Categoria'] == filtros['categoria']).to_numpy(dtype=bool, na_value=False)
+        
+        if filtros.get('banco') not in VALORES_SEM_FILTRO:
+            mascara &= (df['Origem'] == filtros['banco']).to_numpy(dtype=bool, na_value=False)
         
         if filtros.get('data_inicio') and filtros.get('data_fim'):
-            df_filtrado = df_filtrado[
-                (df_filtrado['Data'].dt.date >= filtros['data_inicio']) &
-                (df_filtrado['Data'].dt.date <= filtros['data_fim'])
-            ]
+            dias = df['Data_Dia'].to_numpy()
+            mascara &= (dias >= np.datetime64(filtros['data_inicio'])) & (dias <= np.datetime64(filtros['data_fim']))
+        
+        if filtros.get('tipo_transacao') == 'Apenas Gastos':
+            mascara &= valores_float(df) > 0
+        elif filtros.get('tipo_transacao') == 'Apenas Receitas':
+            mascara &= valores_float(df) < 0
         
-        return df_filtrado
+        return df.loc[mascara]
     
-    def exibir_metricas_principais(self, df_filtrado):
+    def separar_gastos_receitas(self, df_filtrado):
+        """
+        Separa os gastos (Valor > 0) e as receitas (Valor < 0) do DataFrame filtrado.
+        
+        Feito uma vez por execução; gráficos e métricas recebem as partes prontas
+        em vez de refazer a máscara cada um.
+        """
+        valores = valores_float(df_filtrado)
+        return df_filtrado[valores > 0], df_filtrado[valores < 0]
+    
+    def exibir_metricas_principais(self, df_filtrado, df_gastos, df_receitas):
         """Exibe as métricas principais no topo do dashboard."""
         if df_filtrado is None or df_filtrado.empty:
             st.warning("Nenhum dado disponível para exibir métricas.")
@@ -76,7 +217,7 @@ class DashboardGastos:
         col1, col2, col3, col4, col5 = st.columns(5)
         
         with col1:
-            total_gastos = df_filtrado[df_filtrado['Valor'] > 0]['Valor'].sum()
+            total_gastos = df_gastos['Valor'].sum()
             st.metric(
                 label="💰 Total de Gastos",
                 value=f"R$ {total_gastos:,.2f}",
@@ -84,7 +225,7 @@ class DashboardGastos:
             )
         
         with col2:
-            total_receitas = abs(df_filtrado[df_filtrado['Valor'] < 0]['Valor'].sum())
+            total_receitas = abs(df_receitas['Valor'].sum())
             st.metric(
                 label="💵 Total de Receitas",
                 value=f"R$ {total_receitas:,.2f}",
@@ -101,7 +242,7 @@ class DashboardGastos:
             )
         
         with col4:
-            ticket_medio = df_filtrado[df_filtrado['Valor'] > 0]['Valor'].mean()
+            ticket_medio = df_gastos['Valor'].mean()
             st.metric(
                 label="🎯 Ticket Médio",
                 value=f"R$ {ticket_medio:,.2f}" if not pd.isna(ticket_medio) else "R$ 0,00",
@@ -116,24 +257,29 @@ class DashboardGastos:
                 delta=None
             )
     
-    def criar_grafico_pizza_categorias(self, df_filtrado):
-        """Cria gráfico de pizza das categorias."""
-        if df_filtrado is None or df_filtrado.empty:
-            return None
-        
-        # Filtrar apenas gastos (valores positivos)
-        df_gastos = df_filtrado[df_filtrado['Valor'] > 0]
+    def agregar_por_categoria(self, df_gastos):
+        """
+        Agrega os gastos por categoria (total e quantidade), do maior para o menor.
         
-        if df_gastos.empty:
+        Calculado uma vez e compartilhado pelos gráficos de pizza e de barras.
+        """
+        if df_gastos is None or df_gastos.empty:
             return None
         
-        # Agrupar por categoria
-        categorias = df_gastos.groupby('Categoria')['Valor'].sum().reset_index()
-        categorias = categorias.sort_values('Valor', ascending=False)
+        categorias = df_gastos.groupby('Categoria', observed=True).agg(
+            Valor_Total=('Valor', 'sum'),
+            Quantidade=('Valor', 'count')
+        ).reset_index()
+        return categorias.sort_values('Valor_Total', ascending=False, ignore_index=True, kind='stable')
+    
+    def criar_grafico_pizza_categorias(self, categorias):
+        """Cria gráfico de pizza das categorias (a partir de agregar_por_categoria)."""
+        if categorias is None or categorias.empty:
+            return None
         
         fig = px.pie(
             categorias, 
-            values='Valor', 
+            values='Valor_Total', 
             names='Categoria',
             title="Distribuição de Gastos por Categoria",
             color_discrete_sequence=px.colors.qualitative.Set3
@@ -148,24 +294,13 @@ class DashboardGastos:
         
         return fig
     
-    def criar_grafico_barras_categorias(self, df_filtrado):
-        """Cria gráfico de barras das categorias."""
-        if df_filtrado is None or df_filtrado.empty:
-            return None
-        
-        # Filtrar apenas gastos (valores positivos)
-        df_gastos = df_filtrado[df_filtrado['Valor'] > 0]
-        
-        if df_gastos.empty:
+    def criar_grafico_barras_categorias(self, categorias):
+        """Cria gráfico de barras das categorias (a partir de agregar_por_categoria)."""
+        if categorias is None or categorias.empty:
             return None
         
-        # Agrupar por categoria
-        categorias = df_gastos.groupby('Categoria').agg({
-            'Valor': 'sum',
-            'Descricao': 'count'
-        }).reset_index()
-        categorias.columns = ['Categoria', 'Valor_Total', 'Quantidade']
-        categorias = categorias.sort_values('Valor_Total', ascending=True)
+        # Barras horizontais: maior categoria no topo
+        categorias = categorias.iloc[::-1]
         
         fig = go.Figure()
         
@@ -189,24 +324,27 @@ class DashboardGastos:
         
         return fig
     
-    def criar_grafico_timeline(self, df_filtrado):
+    def criar_grafico_timeline(self, df_filtrado, df_gastos, df_receitas):
         """Cria gráfico de linha temporal dos gastos."""
         if df_filtrado is None or df_filtrado.empty:
             return None
         
-        # Separar gastos e receitas
-        df_gastos = df_filtrado[df_filtrado['Valor'] > 0]
-        df_receitas = df_filtrado[df_filtrado['Valor'] < 0]
+        # Agrupar por intervalo de dias: 1 dia enquanto o período couber em
+        # PONTOS_TIMELINE pontos, intervalos maiores em históricos longos
+        dias_periodo = (df_filtrado['Data_Dia'].max() - df_filtrado['Data_Dia'].min()).days
+        dias_intervalo = max(1, -(-dias_periodo // PONTOS_TIMELINE)) if pd.notna(dias_periodo) else 1
+        intervalo = pd.Grouper(key='Data_Dia', freq=f'{dias_intervalo}D')
         
-        # Agrupar por data
-        timeline_gastos = df_gastos.groupby(df_gastos['Data'].dt.date)['Valor'].sum().reset_index()
-        timeline_receitas = df_receitas.groupby(df_receitas['Data'].dt.date)['Valor'].sum().abs().reset_index()
+        # min_count=1 + dropna: intervalos sem transações não viram pontos zerados
+        timeline_gastos = df_gastos.groupby(intervalo)['Valor'].sum(min_count=1).dropna().reset_index()
+        timeline_receitas = df_receitas.groupby(intervalo)['Valor'].sum(min_count=1).dropna().abs().reset_index()
         
         fig = go.Figure()
         
+        # Scattergl: traços renderizados via WebGL em vez de um elemento SVG por ponto
         if not timeline_gastos.empty:
-            fig.add_trace(go.Scatter(
-                x=timeline_gastos['Data'],
+            fig.add_trace(go.Scattergl(
+                x=timeline_gastos['Data_Dia'],
                 y=timeline_gastos['Valor'],
                 mode='lines+markers',
                 name='Gastos',
@@ -215,8 +353,8 @@ class DashboardGastos:
             ))
         
         if not timeline_receitas.empty:
-            fig.add_trace(go.Scatter(
-                x=timeline_receitas['Data'],
+            fig.add_trace(go.Scattergl(
+                x=timeline_receitas['Data_Dia'],
                 y=timeline_receitas['Valor'],
                 mode='lines+markers',
                 name='Receitas',
@@ -234,26 +372,15 @@ class DashboardGastos:
         
         return fig
     
-    def criar_grafico_heatmap_gastos(self, df_filtrado):
+    def criar_grafico_heatmap_gastos(self, df_gastos):
         """Cria heatmap de gastos por dia da semana e hora."""
-        if df_filtrado is None or df_filtrado.empty:
+        if df_gastos is None or df_gastos.empty:
             return None
         
-        # Filtrar apenas gastos
-        df_gastos = df_filtrado[df_filtrado['Valor'] > 0]
-        
-        if df_gastos.empty:
-            return None
-        
-        # Criar matriz de gastos por dia da semana e dia do mês
-        heatmap_data = df_gastos.groupby(['Dia_Semana', 'Dia_Mes'])['Valor'].sum().reset_index()
-        
-        # Pivot para criar matriz
-        pivot_data = heatmap_data.pivot(index='Dia_Semana', columns='Dia_Mes', values='Valor').fillna(0)
-        
-        # Ordenar dias da semana
-        dias_ordem = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        pivot_data = pivot_data.reindex(dias_ordem)
+        # Criar matriz de gastos por dia da semana e dia do mês em um só groupby:
+        # Dia_Semana é categórica ordenada, então observed=False já traz os 7 dias
+        # na ordem de DIAS_SEMANA (sem pivot nem reindex)
+        pivot_data = df_gastos.groupby(['Dia_Semana', 'Dia_Mes'], observed=False)['Valor'].sum().unstack(fill_value=0)
         
         fig = px.imshow(
             pivot_data,
@@ -272,7 +399,7 @@ class DashboardGastos:
             return None
         
         # Agrupar por banco e categoria
-        comparativo = df_filtrado.groupby(['Origem', 'Categoria'])['Valor'].sum().reset_index()
+        comparativo = df_filtrado.groupby(['Origem', 'Categoria'], observed=True)['Valor'].sum().reset_index()
         
         fig = px.bar(
             comparativo,
@@ -291,13 +418,12 @@ class DashboardGastos:
         
         return fig
     
-    def criar_grafico_top_gastos(self, df_filtrado, top_n=10):
+    def criar_grafico_top_gastos(self, df_gastos, top_n=10):
         """Cria gráfico dos maiores gastos."""
-        if df_filtrado is None or df_filtrado.empty:
+        if df_gastos is None or df_gastos.empty:
             return None
         
-        # Filtrar apenas gastos e pegar os maiores
-        df_gastos = df_filtrado[df_filtrado['Valor'] > 0]
+        # Pegar os maiores gastos
         top_gastos = df_gastos.nlargest(top_n, 'Valor')
         
         if top_gastos.empty:
@@ -328,22 +454,31 @@ class DashboardGastos:
         
         # Selecionar colunas para exibição
         colunas_exibir = ['Data', 'Descricao', 'Valor', 'Categoria', 'Origem']
-        df_exibir = df_filtrado[colunas_exibir].copy()
+        df_exibir = df_filtrado[colunas_exibir]
         
-        # Formatar data
-        df_exibir['Data'] = df_exibir['Data'].dt.strftime('%d/%m/%Y')
+        # Ordenar por data (mais recente primeiro), ainda como datetime: a string
+        # DD/MM/AAAA não ordena cronologicamente
+        df_exibir = df_exibir.sort_values('Data', ascending=False)
         
-        # Formatar valor com cores
-        def formatar_valor(valor):
-            if valor >= 0:
-                return f"R$ {valor:,.2f}"
-            else:
-                return f"-R$ {abs(valor):,.2f}"
+        # Enviar ao navegador só as primeiras linhas: o custo de serializar a
+        # tabela cresce com o número de linhas, mesmo as que não ficam visíveis
+        limite = int(st.number_input(
+            "Linhas exibidas:",
+            min_value=100,
+            max_value=max(len(df_exibir), 100),
+            value=min(LIMITE_LINHAS_TABELA, max(len(df_exibir), 100)),
+            step=500
+        ))
+        if len(df_exibir) > limite:
+            st.caption(f"Exibindo {limite:,} de {len(df_exibir):,} transações")
+        df_exibir = df_exibir.head(limite)
         
-        df_exibir['Valor_Formatado'] = df_exibir['Valor'].apply(formatar_valor)
+        # Formatar data (só nas linhas exibidas)
+        df_exibir = df_exibir.assign(Data=df_exibir['Data'].dt.strftime('%d/%m/%Y'))
         
-        # Ordenar por data (mais recente primeiro)
-        df_exibir = df_exibir.sort_values('Data', ascending=False)
+        # Formatar valor: sinal escolhido de forma vetorizada, só o número passa pelo format
+        valores = df_exibir['Valor']
+        df_exibir = df_exibir.assign(Valor_Formatado=np.where(valores >= 0, 'R$ ', '-R$ ') + valores.abs().map('{:,.2f}'.format))
         
         # Remover coluna original de valor
         df_exibir = df_exibir.drop('Valor', axis=1)
@@ -363,23 +498,21 @@ class DashboardGastos:
         
         if self.df is not None and not self.df.empty:
             # Filtro por categoria
-            categorias = ['Todas'] + sorted(self.df['Categoria'].unique().tolist())
             filtros['categoria'] = st.sidebar.selectbox(
                 "Categoria:",
-                categorias
+                self.opcoes_filtros['categorias']
             )
             
             # Filtro por banco
-            bancos = ['Todos'] + sorted(self.df['Origem'].unique().tolist())
             filtros['banco'] = st.sidebar.selectbox(
                 "Banco:",
-                bancos
+                self.opcoes_filtros['bancos']
             )
             
             # Filtro por período
             if 'Data' in self.df.columns:
-                data_min = self.df['Data'].min().date()
-                data_max = self.df['Data'].max().date()
+                data_min = self.opcoes_filtros['data_min']
+                data_max = self.opcoes_filtros['data_max']
                 
                 filtros['data_inicio'] = st.sidebar.date_input(
                     "Data início:",
@@ -403,6 +536,17 @@ class DashboardGastos:
         
         return filtros
     
+    def calcular_estatisticas(self, df_filtrado, coluna):
+        """
+        Calcula total, média, quantidade e desvio padrão de Valor por grupo.
+        
+        Agrega só a série Valor (SeriesGroupBy), com os nomes finais das
+        colunas já na agregação, sem montar e renomear colunas MultiIndex.
+        """
+        return df_filtrado.groupby(coluna, observed=True)['Valor'].agg(
+            **{'Total': 'sum', 'Média': 'mean', 'Quantidade': 'count', 'Desvio Padrão': 'std'}
+        ).round(2)
+    
     def exibir_estatisticas_detalhadas(self, df_filtrado):
         """Exibe estatísticas detalhadas."""
         if df_filtrado is None or df_filtrado.empty:
@@ -414,37 +558,32 @@ class DashboardGastos:
         
         with col1:
             st.write("**Por Categoria:**")
-            stats_categoria = df_filtrado.groupby('Categoria').agg({
-                'Valor': ['sum', 'mean', 'count', 'std']
-            }).round(2)
-            stats_categoria.columns = ['Total', 'Média', 'Quantidade', 'Desvio Padrão']
-            st.dataframe(stats_categoria)
+            st.dataframe(self.calcular_estatisticas(df_filtrado, 'Categoria'))
         
         with col2:
             st.write("**Por Banco:**")
-            stats_banco = df_filtrado.groupby('Origem').agg({
-                'Valor': ['sum', 'mean', 'count', 'std']
-            }).round(2)
-            stats_banco.columns = ['Total', 'Média', 'Quantidade', 'Desvio Padrão']
-            st.dataframe(stats_banco)
-    
-    def exibir_insights_automaticos(self, df_filtrado):
-        """Exibe insights automáticos baseados nos dados."""
-        if df_filtrado is None or df_filtrado.empty:
+            st.dataframe(self.calcular_estatisticas(df_filtrado, 'Origem'))
+    
+    def exibir_insights_automaticos(self, df_gastos):
+        """Exibe insights automáticos baseados nos gastos."""
+        if df_gastos is None or df_gastos.empty:
             return
         
         st.subheader("🧠 Insights Automáticos")
         
-        # Categoria com maior gasto
-        categoria_maior = df_filtrado[df_filtrado['Valor'] > 0].groupby('Categoria')['Valor'].sum().idxmax()
-        valor_maior = df_filtrado[df_filtrado['Valor'] > 0].groupby('Categoria')['Valor'].sum().max()
+        # Agrupar por categoria uma única vez
+        por_categoria = df_gastos.groupby('Categoria', observed=True)['Valor'].agg(['sum', 'mean'])
+        
+        # Categoria com maior gasto (valor lido da própria agregação, sem nova varredura)
+        categoria_maior = por_categoria['sum'].idxmax()
+        valor_maior = por_categoria.at[categoria_maior, 'sum']
         
         # Dia da semana com mais gastos
-        dia_maior = df_filtrado[df_filtrado['Valor'] > 0].groupby('Dia_Semana')['Valor'].sum().idxmax()
+        dia_maior = df_gastos.groupby('Dia_Semana', observed=True)['Valor'].sum().idxmax()
         
         # Ticket médio por categoria
-        ticket_medio_cat = df_filtrado[df_filtrado['Valor'] > 0].groupby('Categoria')['Valor'].mean()
-        categoria_ticket_alto = ticket_medio_cat.idxmax()
+        categoria_ticket_alto = por_categoria['mean'].idxmax()
+        ticket_alto = por_categoria.at[categoria_ticket_alto, 'mean']
         
         col1, col2, col3 = st.columns(3)
         
@@ -455,7 +594,7 @@ class DashboardGastos:
             st.info(f"📅 **Dia com Mais Gastos**\n\n{dia_maior}")
         
         with col3:
-            st.info(f"🎯 **Maior Ticket Médio**\n\n{categoria_ticket_alto}: R$ {ticket_medio_cat[categoria_ticket_alto]:,.2f}")
+            st.info(f"🎯 **Maior Ticket Médio**\n\n{categoria_ticket_alto}: R$ {ticket_alto:,.2f}")
     
     def exibir_insights_llm(self):
         """Exibe insights gerados por LLM."""
@@ -465,12 +604,15 @@ class DashboardGastos:
         if st.button("🧠 Gerar Insights com IA", type="primary"):
             with st.spinner("Analisando seus dados financeiros com IA..."):
                 try:
-                    insights = self.insights_generator.gerar_todos_insights()
-                    
-                    if 'erro' in insights:
-                        st.error(f"❌ {insights['erro']}")
+                    insights_generator = self.insights_generator
+                    if not insights_generator.carregar_dados():
+                        st.error("❌ Não foi possível carregar os dados")
                         return
                     
+                    # Cliente e resumo prontos antes de dividir o trabalho entre as threads
+                    insights_generator.inicializar_llm()
+                    insights_generator.preparar_resumo_dados()
+                    
                     # Exibir insights em abas
                     tab1, tab2, tab3, tab4 = st.tabs([
                         "📊 Análise Geral", 
@@ -479,9 +621,17 @@ class DashboardGastos:
                         "⚠️ Alertas"
                     ])
                     
-                    with tab1:
-                        st.markdown("### 📊 Análise Geral da Situação Financeira")
-                        st.write(insights.get('analise_geral', 'Análise não disponível'))
+                    # A análise geral aparece à medida que é gerada; as demais seções
+                    # são geradas ao mesmo tempo, em uma thread à parte
+                    with ThreadPoolExecutor(max_workers=1) as executor:
+                        demais = executor.submit(insights_generator.gerar_insights,
+                                                 ['recomendacoes', 'tendencias', 'alertas'])
+                        
+                        with tab1:
+                            st.markdown("### 📊 Análise Geral da Situação Financeira")
+                            st.write_stream(insights_generator.gerar_insight_geral_stream())
+                        
+                        insights = demais.result()
                     
                     with tab2:
                         st.markdown("### 💡 Recomendações de Economia")
@@ -508,32 +658,9 @@ class DashboardGastos:
 def main():
     """Função principal do dashboard."""
     
-    # CSS customizado
-    st.markdown("""
-    <style>
-    .metric-card {
-        background-color: #f0f2f6;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        border-left: 4px solid #ff6b6b;
-    }
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 2px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        padding-left: 20px;
-        padding-right: 20px;
-    }
-    .insight-box {
-        background-color: #f8f9fa;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        border-left: 4px solid #28a745;
-        margin: 1rem 0;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    # CSS customizado (precisa ser reenviado a cada execução: elementos não
+    # emitidos em uma reexecução são removidos da página pelo Streamlit)
+    st.markdown(CSS_DASHBOARD, unsafe_allow_html=True)
     
     # Título principal
     st.title("💰 Dashboard de Controle de Gastos Pessoais")
@@ -551,14 +678,12 @@ def main():
     # Criar filtros na sidebar
     filtros = dashboard.criar_sidebar_filtros()
     
-    # Aplicar filtros
+    # Aplicar filtros (inclusive o de tipo de transação)
     df_filtrado = dashboard.aplicar_filtros(dashboard.df, filtros)
     
-    # Aplicar filtro de tipo de transação
-    if filtros.get('tipo_transacao') == 'Apenas Gastos':
-        df_filtrado = df_filtrado[df_filtrado['Valor'] > 0]
-    elif filtros.get('tipo_transacao') == 'Apenas Receitas':
-        df_filtrado = df_filtrado[df_filtrado['Valor'] < 0]
+    # Separar gastos e receitas uma única vez para todos os gráficos
+    df_gastos, df_receitas = dashboard.separar_gastos_receitas(df_filtrado)
+    chave = dashboard.chave_graficos(filtros)
     
     # Informações na sidebar
     st.sidebar.markdown("---")
@@ -566,7 +691,7 @@ def main():
     st.sidebar.info(f"📅 Última atualização: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
     
     # Métricas principais
-    dashboard.exibir_metricas_principais(df_filtrado)
+    dashboard.exibir_metricas_principais(df_filtrado, df_gastos, df_receitas)
     
     st.markdown("---")
     
@@ -584,37 +709,43 @@ def main():
     with tab1:
         st.subheader("📊 Visão Geral dos Gastos")
         
+        # Uma agregação por categoria alimenta os dois gráficos
+        def graficos_categorias():
+            categorias = dashboard.agregar_por_categoria(df_gastos)
+            return (dashboard.criar_grafico_pizza_categorias(categorias),
+                    dashboard.criar_grafico_barras_categorias(categorias))
+        
+        fig_pizza, fig_barras = figura_em_cache('categorias', chave, graficos_categorias)
+        
         col1, col2 = st.columns(2)
         
         with col1:
-            fig_pizza = dashboard.criar_grafico_pizza_categorias(df_filtrado)
             if fig_pizza:
                 st.plotly_chart(fig_pizza, use_container_width=True)
         
         with col2:
-            fig_barras = dashboard.criar_grafico_barras_categorias(df_filtrado)
             if fig_barras:
                 st.plotly_chart(fig_barras, use_container_width=True)
         
         # Insights automáticos
-        dashboard.exibir_insights_automaticos(df_filtrado)
+        dashboard.exibir_insights_automaticos(df_gastos)
     
     with tab2:
         st.subheader("📈 Análise Temporal")
         
-        fig_timeline = dashboard.criar_grafico_timeline(df_filtrado)
+        fig_timeline = figura_em_cache('timeline', chave, lambda: dashboard.criar_grafico_timeline(df_filtrado, df_gastos, df_receitas))
         if fig_timeline:
             st.plotly_chart(fig_timeline, use_container_width=True)
         
         # Gráfico comparativo por bancos
-        fig_comparativo = dashboard.criar_grafico_comparativo_bancos(df_filtrado)
+        fig_comparativo = figura_em_cache('comparativo', chave, lambda: dashboard.criar_grafico_comparativo_bancos(df_filtrado))
         if fig_comparativo:
             st.plotly_chart(fig_comparativo, use_container_width=True)
     
     with tab3:
         st.subheader("🔥 Análise de Padrões")
         
-        fig_heatmap = dashboard.criar_grafico_heatmap_gastos(df_filtrado)
+        fig_heatmap = figura_em_cache('heatmap', chave, lambda: dashboard.criar_grafico_heatmap_gastos(df_gastos))
         if fig_heatmap:
             st.plotly_chart(fig_heatmap, use_container_width=True)
     
@@ -624,7 +755,7 @@ def main():
         # Controle do número de itens no ranking
         top_n = st.slider("Número de itens no ranking:", 5, 20, 10)
         
-        fig_top = dashboard.criar_grafico_top_gastos(df_filtrado, top_n)
+        fig_top = figura_em_cache('top', chave + (top_n,), lambda: dashboard.criar_grafico_top_gastos(df_gastos, top_n))
         if fig_top:
             st.plotly_chart(fig_top, use_container_width=True)
     
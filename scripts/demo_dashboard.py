@@ -5,8 +5,8 @@ Script para demonstrar as funcionalidades do dashboard sem iniciar o servidor.
 """
 
 import pandas as pd
-import os
 from datetime import datetime
+from armazenamento import ARQUIVO_BD_PADRAO, banco_existe, carregar_gastos
 
 def demonstrar_funcionalidades():
     """Demonstra as funcionalidades do dashboard."""
@@ -16,14 +16,14 @@ def demonstrar_funcionalidades():
     print("=" * 60)
     
     # Verificar dados
-    arquivo_dados = "../data/gastos.xlsx"
+    arquivo_dados = ARQUIVO_BD_PADRAO
     
-    if not os.path.exists(arquivo_dados):
+    if not banco_existe(arquivo_dados):
         print("❌ Arquivo de dados não encontrado!")
         return False
     
     try:
-        df = pd.read_excel(arquivo_dados)
+        df = carregar_gastos(arquivo_dados)
         print(f"✅ Dados carregados: {len(df)} registros")
         
         # Converter data
@@ -54,12 +54,8 @@ def demonstrar_funcionalidades():
         
         # Distribuição por banco
         print(f"\n🏦 DISTRIBUIÇÃO POR BANCO:")
-        por_banco = df.groupby('Origem').agg({
-            'Valor': ['sum', 'count']
-        }).round(2)
-        for banco in df['Origem'].unique():
-            total = df[df['Origem'] == banco]['Valor'].sum()
-            count = len(df[df['Origem'] == banco])
+        por_banco = df.groupby('Origem', sort=False)['Valor'].agg(['sum', 'size'])
+        for banco, total, count in por_banco.itertuples(name=None):
             print(f"   • {banco}: R$ {total:,.2f} ({count} transações)")
         
         # Funcionalidades do dashboard
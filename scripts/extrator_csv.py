@@ -7,13 +7,72 @@ Processa arquivos CSV dos Bancos Inter e C6, padronizando os dados.
 import pandas as pd
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple, Union
+from armazenamento import caminho_excel, salvar_gastos
+
+# Colunas padronizadas (e sua ordem) dos dados extraídos de qualquer banco
+COLUNAS_PADRONIZADAS = ['Data', 'Descricao', 'Valor', 'Categoria', 'Subcategoria', 'Mes_Ano', 'Observacoes', 'Origem']
+
+# Tipos das colunas de cada CSV (tudo texto: o valor é convertido depois, sem inferência na leitura)
+TIPOS_CSV_INTER = {'Data': 'string', 'Lançamento': 'string', 'Categoria': 'string', 'Tipo': 'string', 'Valor': 'string'}
+TIPOS_CSV_C6 = {'Data de Compra': 'string', 'Descrição': 'string', 'Categoria': 'string', 'Parcela': 'string', 'Valor (em R$)': 'string'}
+
+def _ler_csv(caminho_arquivo: str, sep: str, encoding: str, tipos: Dict[str, str]) -> pd.DataFrame:
+    """
+    Lê um CSV de fatura com o leitor do pyarrow (multithread, strings em Arrow).
+    
+    Se o pyarrow não conseguir ler o arquivo, usa o leitor C do pandas.
+    
+    Args:
+        caminho_arquivo: Caminho do arquivo CSV
+        sep: Separador de colunas
+        encoding: Codificação do arquivo
+        tipos: Tipos das colunas conhecidas
+        
+    Returns:
+        DataFrame com o conteúdo do arquivo
+    """
+    try:
+        return pd.read_csv(caminho_arquivo, sep=sep, encoding=encoding, dtype=tipos,
+                           engine='pyarrow', dtype_backend='pyarrow')
+    except Exception:
+        return pd.read_csv(caminho_arquivo, sep=sep, encoding=encoding, dtype=tipos,
+                           engine='c', low_memory=False, cache_dates=True)
 
 class ExtratorCSV:
+    # Padrões dos nomes de arquivo (compilados uma única vez)
+    _RE_INTER = re.compile(r'fatura-inter-(\d{4})-(\d{2})\.csv')   # fatura-inter-2025-10.csv
+    _RE_C6 = re.compile(r'Fatura_(\d{4})-(\d{2})-\d{2}\.csv')      # Fatura_2025-10-10.csv
+    
     def __init__(self, pasta_faturas: str = "../faturas"):
         self.pasta_faturas = pasta_faturas
-        self.dados_processados = []
+        self.dados_processados = pd.DataFrame(columns=COLUNAS_PADRONIZADAS)
+    
+    def _classificar(self, nome_arquivo: str) -> Optional[Tuple[str, str]]:
+        """
+        Identifica o banco e o mês/ano do arquivo com um único match por padrão.
+        
+        Args:
+            nome_arquivo: Nome do arquivo CSV
+            
+        Returns:
+            Tupla (banco, MM/YYYY) ou None se o nome não seguir padrão conhecido
+        """
+        # O prefixo já indica o banco: no máximo um padrão é testado por arquivo
+        if nome_arquivo.startswith('fatura-inter-'):
+            banco, padrao = 'inter', self._RE_INTER
+        elif nome_arquivo.startswith('Fatura_'):
+            banco, padrao = 'c6', self._RE_C6
+        else:
+            return None
+        
+        match = padrao.match(nome_arquivo)
+        if match is None:
+            return None
+        ano, mes = match.groups()
+        return banco, f"{mes}/{ano}"
     
     def identificar_banco(self, nome_arquivo: str) -> str:
         """
@@ -25,12 +84,8 @@ class ExtratorCSV:
         Returns:
             'inter', 'c6' ou 'desconhecido'
         """
-        if re.match(r'fatura-inter-\d{4}-\d{2}\.csv', nome_arquivo):
-            return 'inter'
-        elif re.match(r'Fatura_\d{4}-\d{2}-\d{2}\.csv', nome_arquivo):
-            return 'c6'
-        else:
-            return 'desconhecido'
+        classificacao = self._classificar(nome_arquivo)
+        return classificacao[0] if classificacao else 'desconhecido'
     
     def extrair_mes_ano_do_arquivo(self, nome_arquivo: str, banco: str) -> str:
         """
@@ -43,22 +98,13 @@ class ExtratorCSV:
         Returns:
             String no formato MM/YYYY
         """
-        if banco == 'inter':
-            # fatura-inter-2025-10.csv -> 10/2025
-            match = re.search(r'fatura-inter-(\d{4})-(\d{2})\.csv', nome_arquivo)
-            if match:
-                ano, mes = match.groups()
-                return f"{mes}/{ano}"
-        elif banco == 'c6':
-            # Fatura_2025-10-10.csv -> 10/2025
-            match = re.search(r'Fatura_(\d{4})-(\d{2})-\d{2}\.csv', nome_arquivo)
-            if match:
-                ano, mes = match.groups()
-                return f"{mes}/{ano}"
+        classificacao = self._classificar(nome_arquivo)
+        if classificacao and classificacao[0] == banco:
+            return classificacao[1]
         
         return "00/0000"  # Fallback
     
-    def processar_inter(self, caminho_arquivo: str, mes_ano: str) -> List[Dict]:
+    def processar_inter(self, caminho_arquivo: str, mes_ano: str) -> pd.DataFrame:
         """
         Processa arquivo CSV do Banco Inter.
         
@@ -67,42 +113,36 @@ class ExtratorCSV:
             mes_ano: Mês/ano no formato MM/YYYY
             
         Returns:
-            Lista de dicionários com os dados padronizados
+            DataFrame com os dados padronizados (colunas de COLUNAS_PADRONIZADAS)
         """
         try:
             # Ler CSV do Inter (com BOM, separador vírgula)
-            df = pd.read_csv(caminho_arquivo, encoding='utf-8-sig', sep=',')
+            df = _ler_csv(caminho_arquivo, sep=',', encoding='utf-8-sig', tipos=TIPOS_CSV_INTER)
+            
+            # Limpar e converter valor (coluna inteira de uma vez)
+            valores = (df['Valor'].astype(str)
+                       .str.replace('R$', '', regex=False)
+                       .str.replace(' ', '', regex=False)
+                       .str.replace(',', '.', regex=False))
             
-            dados = []
-            for _, row in df.iterrows():
-                # Limpar e converter valor
-                valor_str = str(row['Valor']).replace('R$', '').replace(' ', '').replace(',', '.')
-                try:
-                    valor = float(valor_str)
-                except:
-                    valor = 0.0
-                
-                # Padronizar data
-                data_str = str(row['Data'])
-                
-                dados.append({
-                    'Data': data_str,
-                    'Descricao': str(row['Lançamento']).strip(),
-                    'Valor': valor,
-                    'Categoria': '',  # Será preenchida pelo LLM
-                    'Subcategoria': '',
-                    'Mes_Ano': mes_ano,
-                    'Observacoes': f"Categoria Original: {row['Categoria']} | Tipo: {row['Tipo']}",
-                    'Origem': 'Inter'
-                })
+            dados = pd.DataFrame({
+                'Data': df['Data'].fillna(''),
+                'Descricao': df['Lançamento'].fillna('').str.strip(),
+                'Valor': pd.to_numeric(valores, errors='coerce').fillna(0.0).astype('float64'),
+                'Categoria': '',  # Será preenchida pelo LLM
+                'Subcategoria': '',
+                'Mes_Ano': mes_ano,
+                'Observacoes': 'Categoria Original: ' + df['Categoria'].fillna('') + ' | Tipo: ' + df['Tipo'].fillna(''),
+                'Origem': 'Inter'
+            }, columns=COLUNAS_PADRONIZADAS)
             
             return dados
             
         except Exception as e:
             print(f"Erro ao processar arquivo Inter {caminho_arquivo}: {e}")
-            return []
+            return pd.DataFrame(columns=COLUNAS_PADRONIZADAS)
     
-    def processar_c6(self, caminho_arquivo: str, mes_ano: str) -> List[Dict]:
+    def processar_c6(self, caminho_arquivo: str, mes_ano: str) -> pd.DataFrame:
         """
         Processa arquivo CSV do Banco C6.
         
@@ -111,95 +151,116 @@ class ExtratorCSV:
             mes_ano: Mês/ano no formato MM/YYYY
             
         Returns:
-            Lista de dicionários com os dados padronizados
+            DataFrame com os dados padronizados (colunas de COLUNAS_PADRONIZADAS)
         """
         try:
             # Ler CSV do C6 (separador ponto e vírgula)
-            df = pd.read_csv(caminho_arquivo, encoding='utf-8', sep=';')
+            df = _ler_csv(caminho_arquivo, sep=';', encoding='utf-8', tipos=TIPOS_CSV_C6)
             
-            dados = []
-            for _, row in df.iterrows():
-                # Converter valor (já vem como número)
-                try:
-                    valor = float(row['Valor (em R$)'])
-                except:
-                    valor = 0.0
-                
-                # Padronizar data
-                data_str = str(row['Data de Compra'])
-                
-                # Informação de parcela
-                parcela_info = str(row['Parcela']) if pd.notna(row['Parcela']) else ''
-                
-                dados.append({
-                    'Data': data_str,
-                    'Descricao': str(row['Descrição']).strip(),
-                    'Valor': valor,
-                    'Categoria': '',  # Será preenchida pelo LLM
-                    'Subcategoria': '',
-                    'Mes_Ano': mes_ano,
-                    'Observacoes': f"Categoria Original: {row['Categoria']} | Parcela: {parcela_info}",
-                    'Origem': 'C6'
-                })
+            dados = pd.DataFrame({
+                'Data': df['Data de Compra'].fillna(''),
+                'Descricao': df['Descrição'].fillna('').str.strip(),
+                'Valor': pd.to_numeric(df['Valor (em R$)'], errors='coerce').fillna(0.0).astype('float64'),  # Já vem como número
+                'Categoria': '',  # Será preenchida pelo LLM
+                'Subcategoria': '',
+                'Mes_Ano': mes_ano,
+                'Observacoes': 'Categoria Original: ' + df['Categoria'].fillna('') + ' | Parcela: ' + df['Parcela'].fillna(''),
+                'Origem': 'C6'
+            }, columns=COLUNAS_PADRONIZADAS)
             
             return dados
             
         except Exception as e:
             print(f"Erro ao processar arquivo C6 {caminho_arquivo}: {e}")
-            return []
+            return pd.DataFrame(columns=COLUNAS_PADRONIZADAS)
     
-    def processar_todos_arquivos(self) -> List[Dict]:
+    def processar_arquivo(self, caminho_arquivo: str, banco: str, mes_ano: str) -> pd.DataFrame:
+        """
+        Processa um arquivo CSV com o método do banco correspondente.
+        
+        Args:
+            caminho_arquivo: Caminho completo do arquivo
+            banco: Banco identificado ('inter' ou 'c6')
+            mes_ano: Mês/ano no formato MM/YYYY
+            
+        Returns:
+            DataFrame com os dados padronizados
+        """
+        if banco == 'inter':
+            return self.processar_inter(caminho_arquivo, mes_ano)
+        return self.processar_c6(caminho_arquivo, mes_ano)
+    
+    def processar_todos_arquivos(self) -> pd.DataFrame:
         """
         Processa todos os arquivos CSV na pasta de faturas.
         
         Returns:
-            Lista consolidada com todos os dados processados
+            DataFrame consolidado com todos os dados processados
         """
         todos_dados = []
         
         if not os.path.exists(self.pasta_faturas):
             print(f"Pasta {self.pasta_faturas} não encontrada!")
-            return todos_dados
+            return pd.DataFrame(columns=COLUNAS_PADRONIZADAS)
         
-        arquivos_csv = [f for f in os.listdir(self.pasta_faturas) if f.endswith('.csv')]
+        with os.scandir(self.pasta_faturas) as entradas:
+            arquivos_csv = [e for e in entradas if e.name.endswith('.csv') and e.is_file()]
         
-        for arquivo in arquivos_csv:
-            caminho_completo = os.path.join(self.pasta_faturas, arquivo)
-            banco = self.identificar_banco(arquivo)
+        tarefas = []
+        for entrada in arquivos_csv:
+            arquivo = entrada.name
+            classificacao = self._classificar(arquivo)
             
-            if banco == 'desconhecido':
+            if classificacao is None:
                 print(f"Arquivo {arquivo} não segue padrão conhecido. Ignorando.")
                 continue
             
-            mes_ano = self.extrair_mes_ano_do_arquivo(arquivo, banco)
-            
+            banco, mes_ano = classificacao
+            tarefas.append((arquivo, entrada.path, banco, mes_ano))
+        
+        caminhos = [t[1] for t in tarefas]
+        bancos = [t[2] for t in tarefas]
+        periodos = [t[3] for t in tarefas]
+        
+        # Arquivos independentes: com mais de 2, cada um é processado em um processo
+        if len(tarefas) <= 2:
+            resultados = map(self.processar_arquivo, caminhos, bancos, periodos)
+        else:
+            with ProcessPoolExecutor(max_workers=min(len(tarefas), os.cpu_count() or 1)) as executor:
+                resultados = list(executor.map(self.processar_arquivo, caminhos, bancos, periodos))
+        
+        for (arquivo, _, banco, mes_ano), dados in zip(tarefas, resultados):
             print(f"Processando {arquivo} (Banco: {banco.upper()}, Período: {mes_ano})")
-            
-            if banco == 'inter':
-                dados = self.processar_inter(caminho_completo, mes_ano)
-            elif banco == 'c6':
-                dados = self.processar_c6(caminho_completo, mes_ano)
-            
-            todos_dados.extend(dados)
+            todos_dados.append(dados)
             print(f"  → {len(dados)} transações processadas")
         
-        self.dados_processados = todos_dados
-        return todos_dados
+        if todos_dados:
+            self.dados_processados = pd.concat(todos_dados, ignore_index=True)
+        else:
+            self.dados_processados = pd.DataFrame(columns=COLUNAS_PADRONIZADAS)
+        return self.dados_processados
     
-    def salvar_dados_temporarios(self, dados: List[Dict], arquivo_saida: str = "../data/dados_temp.xlsx"):
+    def salvar_dados_temporarios(self, dados: Union[pd.DataFrame, List[Dict]], arquivo_saida: str = "../data/dados_temp.parquet",
+                                 excel: bool = False):
         """
         Salva os dados processados em um arquivo temporário para análise.
         
         Args:
-            dados: Lista de dados processados
+            dados: DataFrame (ou lista de dicionários) com os dados processados
             arquivo_saida: Caminho do arquivo de saída
+            excel: Se True, grava em .xlsx (formato antigo) em vez de Parquet
         """
-        if not dados:
+        if len(dados) == 0:
             print("Nenhum dado para salvar.")
             return
         
-        df = pd.DataFrame(dados)
-        df.to_excel(arquivo_saida, index=False, engine='openpyxl')
+        if excel:
+            arquivo_saida = caminho_excel(arquivo_saida)
+        elif arquivo_saida.endswith('.xlsx'):
+            arquivo_saida = os.path.splitext(arquivo_saida)[0] + ".parquet"
+        
+        df = dados if isinstance(dados, pd.DataFrame) else pd.DataFrame(dados)
+        salvar_gastos(df, arquivo_saida)
         print(f"Dados temporários salvos em: {arquivo_saida}")
         print(f"Total de transações: {len(dados)}")
 
@@ -210,12 +271,12 @@ def main():
     print("=== EXTRATOR DE CSV - TESTE ===")
     dados = extrator.processar_todos_arquivos()
     
-    if dados:
+    if not dados.empty:
         extrator.salvar_dados_temporarios(dados)
         
         # Estatísticas básicas
         print("\n=== ESTATÍSTICAS ===")
-        df = pd.DataFrame(dados)
+        df = dados
         print(f"Total de transações: {len(df)}")
         print(f"Bancos processados: {df['Origem'].unique()}")
         print(f"Períodos encontrados: {df['Mes_Ano'].unique()}")
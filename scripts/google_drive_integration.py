@@ -7,20 +7,32 @@ Permite baixar arquivos de uma pasta compartilhada do Google Drive.
 import os
 import requests
 import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from typing import List, Dict, Optional
 from datetime import datetime
 
+# ID do arquivo em URLs do Google Drive (/file/d/<id>, ?id=<id>, /open?id=<id>) numa única busca
+_RE_DRIVE_ID = re.compile(r'(?:/file/d/|[?&]id=)([a-zA-Z0-9_-]+)')
+
 class GoogleDriveIntegration:
-    def __init__(self, folder_id: Optional[str] = None):
+    def __init__(self, folder_id: Optional[str] = None, sessao: Optional[requests.Session] = None):
         """
         Inicializa a integração com Google Drive.
         
         Args:
             folder_id: ID da pasta compartilhada do Google Drive
+            sessao: Sessão HTTP compartilhada (criada com pool de conexões se não informada)
         """
         self.folder_id = folder_id or self.obter_folder_id_config()
         self.pasta_local = "../faturas"
         self.arquivos_baixados = []
+        
+        if sessao is None:
+            sessao = requests.Session()
+            sessao.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self.sessao = sessao
     
     def obter_folder_id_config(self) -> Optional[str]:
         """Obtém o folder ID do arquivo de configuração."""
@@ -68,18 +80,8 @@ GOOGLE_DRIVE_FOLDER_ID = "SEU_FOLDER_ID_AQUI"
     
     def extrair_file_id_da_url(self, url: str) -> Optional[str]:
         """Extrai file ID de uma URL do Google Drive."""
-        patterns = [
-            r'/file/d/([a-zA-Z0-9-_]+)',
-            r'id=([a-zA-Z0-9-_]+)',
-            r'/open\?id=([a-zA-Z0-9-_]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        
-        return None
+        match = _RE_DRIVE_ID.search(url)
+        return match.group(1) if match else None
     
     def listar_arquivos_pasta(self) -> List[Dict]:
         """
@@ -105,17 +107,17 @@ GOOGLE_DRIVE_FOLDER_ID = "SEU_FOLDER_ID_AQUI"
             
             print(f"📥 Baixando: {nome_arquivo}")
             
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            # Garantir que a pasta existe
-            os.makedirs(self.pasta_local, exist_ok=True)
-            
-            # Salvar arquivo
-            caminho_arquivo = os.path.join(self.pasta_local, nome_arquivo)
-            with open(caminho_arquivo, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            with self.sessao.get(url, stream=True) as response:
+                response.raise_for_status()
+                
+                # Garantir que a pasta existe
+                os.makedirs(self.pasta_local, exist_ok=True)
+                
+                # Salvar arquivo (cópia direta do stream em blocos de 1 MiB, descompactando gzip)
+                caminho_arquivo = os.path.join(self.pasta_local, nome_arquivo)
+                response.raw.decode_content = True
+                with open(caminho_arquivo, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f, length=1024 * 1024)
             
             self.arquivos_baixados.append(caminho_arquivo)
             print(f"✅ Arquivo salvo: {caminho_arquivo}")
@@ -125,28 +127,38 @@ GOOGLE_DRIVE_FOLDER_ID = "SEU_FOLDER_ID_AQUI"
             print(f"❌ Erro ao baixar {nome_arquivo}: {e}")
             return False
     
-    def baixar_arquivos_por_lista(self, urls_arquivos: List[Dict[str, str]]) -> int:
+    def baixar_arquivos_por_lista(self, urls_arquivos: List[Dict[str, str]], max_downloads: int = 8) -> int:
         """
         Baixa arquivos a partir de uma lista de URLs.
         
+        Os downloads rodam em paralelo (limitados a max_downloads simultâneos),
+        compartilhando as conexões da sessão HTTP.
+        
         Args:
             urls_arquivos: Lista de dicts com 'url' e 'nome'
+            max_downloads: Número máximo de downloads simultâneos
         
         Returns:
             Número de arquivos baixados com sucesso
         """
-        sucessos = 0
-        
         print(f"🚀 Iniciando download de {len(urls_arquivos)} arquivos...")
         
-        for item in urls_arquivos:
+        def baixar_item(posicao_item):
+            posicao, item = posicao_item
             url = item.get('url', '')
-            nome = item.get('nome', f'arquivo_{sucessos + 1}.csv')
-            
-            if self.baixar_arquivo_por_url(url, nome):
-                sucessos += 1
+            nome = item.get('nome', f'arquivo_{posicao}.csv')
+            return self.baixar_arquivo_por_url(url, nome)
+        
+        itens = list(enumerate(urls_arquivos, 1))
+        if not itens:
+            print("⚠️  Nenhum arquivo na lista para baixar")
+            return 0
+        
+        with ThreadPoolExecutor(max_workers=min(max_downloads, len(itens))) as executor:
+            resultados = list(executor.map(baixar_item, itens))
         
-        print(f"✅ {sucessos}/{len(urls_arquivos)} arquivos baixados com sucesso")
+        sucessos = sum(resultados)
+        print(f"✅ {sucessos}/{len(resultados)} arquivos baixados com sucesso")
         return sucessos
     
     def gerar_relatorio_download(self) -> Dict:
@@ -4,29 +4,30 @@ Script de Inicialização do Dashboard - Sistema de Controle de Gastos Pessoais
 Inicia o dashboard web de forma conveniente.
 """
 
-import os
+import importlib.util
 import sys
 import subprocess
 from datetime import datetime
 
 def verificar_dados():
     """Verifica se os dados estão disponíveis."""
-    arquivo_dados = "../data/gastos.xlsx"
+    from armazenamento import ARQUIVO_BD_PADRAO, banco_existe, contar_registros
     
-    if not os.path.exists(arquivo_dados):
+    arquivo_dados = ARQUIVO_BD_PADRAO
+    
+    if not banco_existe(arquivo_dados):
         print("❌ Arquivo de dados não encontrado!")
         print("   Execute primeiro: python3 processar_faturas.py")
         return False
     
     try:
-        import pandas as pd
-        df = pd.read_excel(arquivo_dados)
+        total_registros = contar_registros(arquivo_dados)
         
-        if df.empty:
+        if total_registros == 0:
             print("❌ Arquivo de dados está vazio!")
             return False
         
-        print(f"✅ Dados encontrados: {len(df)} registros")
+        print(f"✅ Dados encontrados: {total_registros} registros")
         return True
         
     except Exception as e:
@@ -35,12 +36,11 @@ def verificar_dados():
 
 def verificar_dependencias():
     """Verifica se as dependências estão instaladas."""
-    dependencias = ['streamlit', 'plotly', 'pandas']
+    dependencias = ['streamlit', 'plotly', 'pandas', 'pyarrow']
     
     for dep in dependencias:
-        try:
-            __import__(dep)
-        except ImportError:
+        # Só localiza o pacote, sem importá-lo (o Streamlit importa tudo de novo no processo filho)
+        if importlib.util.find_spec(dep) is None:
             print(f"❌ Dependência não encontrada: {dep}")
             print(f"   Instale com: pip3 install {dep}")
             return False
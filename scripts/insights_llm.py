@@ -5,81 +5,272 @@ Gera análises inteligentes e recomendações usando LLM.
 """
 
 import pandas as pd
+import numpy as np
+import asyncio
+import functools
+import hashlib
 import json
+import os
+import tempfile
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
 from config_llm import ConfigLLM
+from armazenamento import ARQUIVO_BD_PADRAO, carregar_gastos
+
+# Colunas do banco de dados usadas nas análises (as demais não são lidas do disco)
+COLUNAS_INSIGHTS = ['Data', 'Descricao', 'Valor', 'Categoria', 'Origem']
+
+# Seções de insights, na ordem exibida (e chaves do JSON da análise combinada)
+SECOES_INSIGHTS = ('analise_geral', 'recomendacoes', 'tendencias', 'alertas')
+
+# Limite de tokens da resposta de cada seção (folga para as análises em texto corrido);
+# as análises usam temperature=0, respostas determinísticas para os mesmos dados
+TOKENS_POR_SECAO = {'analise_geral': 800, 'recomendacoes': 600, 'tendencias': 500, 'alertas': 400}
+
+PROMPT_INSIGHTS_COMBINADOS = """Você é um consultor financeiro especializado em análise de gastos pessoais.
+
+Abaixo estão tarefas de análise sobre os mesmos dados financeiros, cada uma identificada por uma chave.
+Execute todas e responda APENAS com um objeto JSON com as chaves {chaves};
+o valor de cada chave é o texto da respectiva análise (Markdown),
+em português brasileiro, seguindo as instruções da tarefa.
+
+"""
+
+def resposta_combinada_valida(resposta: str, secoes: Sequence[str] = SECOES_INSIGHTS) -> bool:
+    """
+    Verifica se a resposta da análise combinada é um objeto JSON com todas as seções.
+    
+    Args:
+        resposta: Texto retornado pelo LLM
+        secoes: Seções pedidas na requisição combinada
+        
+    Returns:
+        True se todas as chaves de secoes estiverem presentes e preenchidas
+    """
+    try:
+        dados = json.loads(resposta)
+    except ValueError:
+        return False
+    return isinstance(dados, dict) and all(dados.get(secao) for secao in secoes)
 
 class InsightsLLM:
-    def __init__(self, arquivo_dados: str = "../data/gastos.xlsx"):
+    def __init__(self, arquivo_dados: str = ARQUIVO_BD_PADRAO):
         self.arquivo_dados = arquivo_dados
         self.config_llm = ConfigLLM()
         self.df = None
-        self.insights_cache = {}
+        self.insights_cache = {}  # Chave do prompt -> resposta (camada em memória do cache em disco)
+        self.pasta_cache = os.path.join(os.path.dirname(arquivo_dados), ".insights_cache")
+        self._resumo_cache = None
+        self._gastos_cache = None
     
     def inicializar_llm(self) -> bool:
-        """Inicializa o LLM para geração de insights."""
+        """
+        Inicializa o LLM para geração de insights.
+        
+        O cliente é configurado uma única vez e compartilhado pelas análises,
+        inclusive quando rodam em paralelo (gerar_secoes_em_paralelo).
+        """
+        if self.config_llm.configurado and self.config_llm.client is not None:
+            return True
         return self.config_llm.configurar_cliente()
     
     def carregar_dados(self) -> bool:
         """Carrega os dados financeiros."""
         try:
-            self.df = pd.read_excel(self.arquivo_dados, engine='openpyxl')
+            self.df = carregar_gastos(self.arquivo_dados, colunas=COLUNAS_INSIGHTS)
             self.df['Data'] = pd.to_datetime(self.df['Data'], format='%d/%m/%Y', errors='coerce')
+            
+            # Colunas derivadas da data, calculadas uma vez por carga (usadas na análise de tendências)
+            self.df['Mes'] = self.df['Data'].dt.to_period('M')
+            self.df['Dia_Semana'] = self.df['Data'].dt.day_name().astype('category')
+            self._resumo_cache = None
+            self._gastos_cache = None
             return True
         except Exception as e:
             print(f"Erro ao carregar dados: {e}")
             return False
     
+    def obter_gastos(self) -> pd.DataFrame:
+        """Retorna os gastos (valores positivos), filtrados uma vez por carga de dados."""
+        if self._gastos_cache is None:
+            self._gastos_cache = self.df[self.df['Valor'] > 0]
+        return self._gastos_cache
+    
     def preparar_resumo_dados(self) -> Dict:
-        """Prepara um resumo dos dados para o LLM."""
+        """
+        Prepara um resumo dos dados para o LLM.
+        
+        O resumo é calculado uma vez por carga de dados (carregar_dados limpa o
+        cache) e reaproveitado por todas as análises.
+        """
         if self.df is None or self.df.empty:
             return {}
         
+        if self._resumo_cache is not None:
+            return self._resumo_cache
+        
         # Separar gastos e receitas
-        gastos = self.df[self.df['Valor'] > 0]
+        gastos = self.obter_gastos()
         receitas = self.df[self.df['Valor'] < 0]
         
+        # Agregações combinadas (uma passada por agrupamento)
+        datas = self.df['Data'].agg(['min', 'max'])
+        estatisticas_gastos = gastos['Valor'].agg(['sum', 'mean', 'max'])
+        por_categoria = gastos.groupby('Categoria', observed=True)['Valor'].agg(['sum', 'size'])
+        por_banco = self.df.groupby('Origem', observed=True)['Valor'].agg(['sum', 'size'])
+        
         # Estatísticas básicas
         resumo = {
             'periodo': {
-                'inicio': self.df['Data'].min().strftime('%d/%m/%Y'),
-                'fim': self.df['Data'].max().strftime('%d/%m/%Y'),
-                'dias': (self.df['Data'].max() - self.df['Data'].min()).days
+                'inicio': datas['min'].strftime('%d/%m/%Y'),
+                'fim': datas['max'].strftime('%d/%m/%Y'),
+                'dias': (datas['max'] - datas['min']).days
             },
             'totais': {
-                'gastos': float(gastos['Valor'].sum()),
+                'gastos': float(estatisticas_gastos['sum']),
                 'receitas': float(abs(receitas['Valor'].sum())),
                 'saldo': float(self.df['Valor'].sum()),
                 'transacoes': len(self.df)
             },
             'categorias': {
-                'gastos_por_categoria': gastos.groupby('Categoria')['Valor'].sum().to_dict(),
-                'quantidade_por_categoria': gastos.groupby('Categoria').size().to_dict()
+                'gastos_por_categoria': por_categoria['sum'].to_dict(),
+                'quantidade_por_categoria': por_categoria['size'].to_dict()
             },
             'bancos': {
-                'gastos_por_banco': self.df.groupby('Origem')['Valor'].sum().to_dict(),
-                'transacoes_por_banco': self.df.groupby('Origem').size().to_dict()
+                'gastos_por_banco': por_banco['sum'].to_dict(),
+                'transacoes_por_banco': por_banco['size'].to_dict()
             },
             'padroes': {
-                'ticket_medio': float(gastos['Valor'].mean()) if not gastos.empty else 0,
-                'maior_gasto': float(gastos['Valor'].max()) if not gastos.empty else 0,
-                'categoria_principal': gastos.groupby('Categoria')['Valor'].sum().idxmax() if not gastos.empty else 'N/A'
+                'ticket_medio': float(estatisticas_gastos['mean']) if not gastos.empty else 0,
+                'maior_gasto': float(estatisticas_gastos['max']) if not gastos.empty else 0,
+                'categoria_principal': por_categoria['sum'].idxmax() if not gastos.empty else 'N/A'
             }
         }
         
+        self._resumo_cache = resumo
         return resumo
     
-    def gerar_insight_geral(self) -> str:
-        """Gera insight geral sobre os gastos."""
-        if not self.inicializar_llm():
-            return "Erro ao conectar com o sistema de análise."
+    def _completar(self, prompt: str, max_tokens: int, temperature: float,
+                   validar: Optional[Callable[[str], bool]] = None, **parametros) -> Optional[str]:
+        """
+        Envia um prompt ao LLM e retorna o texto da resposta.
         
-        resumo = self.preparar_resumo_dados()
-        if not resumo:
-            return "Dados insuficientes para análise."
+        As respostas ficam em cache (memória + disco), indexadas pelo hash do
+        prompt e dos parâmetros: como o prompt contém os dados resumidos, uma
+        nova análise sobre os mesmos dados não chama a API de novo.
+        Respostas cortadas pelo limite de tokens (finish_reason 'length') ou
+        reprovadas por validar não são guardadas.
+        
+        Args:
+            prompt: Prompt do usuário
+            max_tokens: Limite de tokens da resposta
+            temperature: Temperatura de amostragem
+            validar: Função que diz se a resposta é utilizável (também aplicada ao cache)
+            **parametros: Parâmetros extras da API (ex.: response_format)
+            
+        Returns:
+            Texto da resposta ou None se vier vazia
+        """
+        chave = self._chave_cache(prompt, max_tokens, temperature, parametros)
+        resposta = self._ler_cache(chave)
+        if resposta is not None and (validar is None or validar(resposta)):
+            return resposta
+        
+        response = self.config_llm.client.chat.completions.create(
+            model=self.config_llm.modelo,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **parametros
+        )
+        
+        if response and response.choices and response.choices[0].message.content:
+            escolha = response.choices[0]
+            resposta = escolha.message.content.strip()
+            if escolha.finish_reason != 'length' and (validar is None or validar(resposta)):
+                self._salvar_cache(chave, resposta)
+            return resposta
+        return None
+    
+    def _completar_stream(self, prompt: str, max_tokens: int, temperature: float) -> Iterator[str]:
+        """
+        Versão em streaming de _completar: produz os trechos do texto à medida que chegam.
+        
+        Usa o mesmo cache de _completar (uma resposta em cache sai de uma vez;
+        uma resposta nova é guardada ao fim do stream, se não tiver sido cortada
+        pelo limite de tokens).
+        
+        Args:
+            prompt: Prompt do usuário
+            max_tokens: Limite de tokens da resposta
+            temperature: Temperatura de amostragem
+            
+        Yields:
+            Trechos do texto da resposta
+        """
+        chave = self._chave_cache(prompt, max_tokens, temperature, {})
+        resposta = self._ler_cache(chave)
+        if resposta is not None:
+            yield resposta
+            return
         
-        prompt = f"""Você é um consultor financeiro especializado em análise de gastos pessoais.
+        stream = self.config_llm.client.chat.completions.create(
+            model=self.config_llm.modelo,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        
+        trechos = []
+        finish_reason = None
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            if chunk.choices[0].delta.content:
+                trechos.append(chunk.choices[0].delta.content)
+                yield trechos[-1]
+        
+        resposta = "".join(trechos).strip()
+        if resposta and finish_reason != 'length':
+            self._salvar_cache(chave, resposta)
+    
+    def _chave_cache(self, prompt: str, max_tokens: int, temperature: float, parametros: Dict) -> str:
+        """Chave do cache de insights: hash do modelo, prompt e parâmetros da requisição."""
+        return hashlib.sha1(json.dumps(
+            [self.config_llm.modelo, prompt, max_tokens, temperature, parametros],
+            sort_keys=True, ensure_ascii=False, default=str
+        ).encode('utf-8')).hexdigest()
+    
+    def _ler_cache(self, chave: str) -> Optional[str]:
+        """Busca uma resposta no cache de insights (memória e, depois, disco)."""
+        if chave in self.insights_cache:
+            return self.insights_cache[chave]
+        
+        try:
+            with open(os.path.join(self.pasta_cache, f"{chave}.txt"), 'r', encoding='utf-8') as f:
+                resposta = f.read()
+        except OSError:
+            return None
+        
+        self.insights_cache[chave] = resposta
+        return resposta
+    
+    def _salvar_cache(self, chave: str, resposta: str):
+        """Guarda uma resposta no cache de insights (gravação atômica no disco)."""
+        self.insights_cache[chave] = resposta
+        try:
+            os.makedirs(self.pasta_cache, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.pasta_cache, suffix='.tmp', delete=False) as f:
+                f.write(resposta)
+            os.replace(f.name, os.path.join(self.pasta_cache, f"{chave}.txt"))
+        except Exception as e:
+            print(f"⚠️  Erro ao salvar cache de insights: {e}")
+    
+    def _prompt_insight_geral(self, resumo: Dict) -> str:
+        """Monta o prompt da análise geral."""
+        return f"""Você é um consultor financeiro especializado em análise de gastos pessoais.
 
 Analise os dados financeiros abaixo e forneça insights valiosos e recomendações práticas:
 
@@ -108,39 +299,67 @@ INSTRUÇÕES:
 4. Dê recomendações práticas e específicas
 5. Use linguagem acessível e evite jargões técnicos
 6. Seja positivo mas realista
+7. Seja conciso: no máximo 4 tópicos curtos por parte da análise
 
 Responda em português brasileiro, de forma estruturada e profissional."""
-
+    
+    def gerar_insight_geral_stream(self) -> Iterator[str]:
+        """
+        Gera o insight geral em streaming, produzindo o texto à medida que chega
+        (ex.: para st.write_stream no dashboard).
+        
+        Uma falha no meio do stream não é emendada ao texto parcial como se fosse
+        parte da análise: o trecho final avisa que a resposta foi interrompida.
+        
+        Yields:
+            Trechos do texto da análise (ou a mensagem de erro)
+        """
+        if not self.inicializar_llm():
+            yield "Erro ao conectar com o sistema de análise."
+            return
+        
+        resumo = self.preparar_resumo_dados()
+        if not resumo:
+            yield "Dados insuficientes para análise."
+            return
+        
+        recebido = False
         try:
-            response = self.config_llm.client.chat.completions.create(
-                model=self.config_llm.modelo,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=800,
-                temperature=0.7
-            )
-            
-            if response and response.choices:
-                return response.choices[0].message.content.strip()
-            else:
-                return "Não foi possível gerar insights no momento."
-                
+            for trecho in self._completar_stream(self._prompt_insight_geral(resumo), max_tokens=TOKENS_POR_SECAO['analise_geral'], temperature=0):
+                recebido = True
+                yield trecho
         except Exception as e:
-            return f"Erro na análise: {str(e)}"
+            if recebido:
+                yield f"\n\n⚠️ *Análise interrompida: {str(e)}*"
+            else:
+                yield f"Erro na análise: {str(e)}"
+            return
+        
+        if not recebido:
+            yield "Não foi possível gerar insights no momento."
     
-    def gerar_recomendacoes_economia(self) -> str:
-        """Gera recomendações específicas de economia."""
+    def gerar_insight_geral(self) -> str:
+        """Gera insight geral sobre os gastos."""
         if not self.inicializar_llm():
-            return "Erro ao conectar com o sistema de recomendações."
+            return "Erro ao conectar com o sistema de análise."
         
         resumo = self.preparar_resumo_dados()
         if not resumo:
-            return "Dados insuficientes para recomendações."
+            return "Dados insuficientes para análise."
         
+        try:
+            resposta = self._completar(self._prompt_insight_geral(resumo), max_tokens=TOKENS_POR_SECAO['analise_geral'], temperature=0)
+            return resposta or "Não foi possível gerar insights no momento."
+        except Exception as e:
+            return f"Erro na análise: {str(e)}"
+    
+    def _prompt_recomendacoes(self, resumo: Dict) -> str:
+        """Monta o prompt das recomendações de economia."""
         # Identificar categorias com maior potencial de economia
         gastos_cat = resumo['categorias']['gastos_por_categoria']
         categorias_ordenadas = sorted(gastos_cat.items(), key=lambda x: x[1], reverse=True)
         
-        prompt = f"""Você é um consultor financeiro especializado em otimização de gastos pessoais.
+        return f"""Você é um consultor financeiro especializado em otimização de gastos pessoais.
 
 Com base nos dados de gastos abaixo, forneça recomendações ESPECÍFICAS e PRÁTICAS para economia:
 
@@ -164,42 +383,36 @@ Formato da resposta:
 - Use bullet points para facilitar leitura
 - Seja específico (ex: "reduza 15% nos gastos com alimentação")
 - Inclua pelo menos uma dica para cada categoria principal
+- No máximo 4 bullet points por categoria
 
 Responda em português brasileiro."""
-
+    
+    def gerar_recomendacoes_economia(self) -> str:
+        """Gera recomendações específicas de economia."""
+        if not self.inicializar_llm():
+            return "Erro ao conectar com o sistema de recomendações."
+        
+        resumo = self.preparar_resumo_dados()
+        if not resumo:
+            return "Dados insuficientes para recomendações."
+        
         try:
-            response = self.config_llm.client.chat.completions.create(
-                model=self.config_llm.modelo,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=600,
-                temperature=0.6
-            )
-            
-            if response and response.choices:
-                return response.choices[0].message.content.strip()
-            else:
-                return "Não foi possível gerar recomendações no momento."
-                
+            resposta = self._completar(self._prompt_recomendacoes(resumo), max_tokens=TOKENS_POR_SECAO['recomendacoes'], temperature=0)
+            return resposta or "Não foi possível gerar recomendações no momento."
         except Exception as e:
             return f"Erro nas recomendações: {str(e)}"
     
-    def gerar_analise_tendencias(self) -> str:
-        """Gera análise de tendências e padrões."""
-        if not self.inicializar_llm():
-            return "Erro ao conectar com o sistema de análise."
-        
-        if self.df is None or self.df.empty:
-            return "Dados insuficientes para análise de tendências."
+    def _prompt_tendencias(self) -> str:
+        """Monta o prompt da análise de tendências."""
+        gastos = self.obter_gastos()
         
         # Análise temporal
-        self.df['Mes_Ano'] = self.df['Data'].dt.to_period('M')
-        gastos_mensais = self.df[self.df['Valor'] > 0].groupby('Mes_Ano')['Valor'].sum()
+        gastos_mensais = gastos.groupby('Mes')['Valor'].sum()
         
         # Análise por dia da semana
-        self.df['Dia_Semana'] = self.df['Data'].dt.day_name()
-        gastos_dia_semana = self.df[self.df['Valor'] > 0].groupby('Dia_Semana')['Valor'].sum()
+        gastos_dia_semana = gastos.groupby('Dia_Semana', observed=True)['Valor'].sum()
         
-        prompt = f"""Você é um analista financeiro especializado em identificação de padrões de consumo.
+        return f"""Você é um analista financeiro especializado em identificação de padrões de consumo.
 
 Analise os padrões temporais de gastos abaixo e identifique tendências importantes:
 
@@ -217,55 +430,59 @@ INSTRUÇÕES:
 3. Destaque tendências de crescimento ou redução
 4. Identifique dias/períodos de maior gasto
 5. Sugira estratégias baseadas nos padrões identificados
+6. Seja conciso: no máximo 5 tópicos curtos no total
 
 Seja objetivo e foque em insights acionáveis. Responda em português brasileiro."""
-
-        try:
-            response = self.config_llm.client.chat.completions.create(
-                model=self.config_llm.modelo,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=500,
-                temperature=0.5
-            )
-            
-            if response and response.choices:
-                return response.choices[0].message.content.strip()
-            else:
-                return "Não foi possível analisar tendências no momento."
-                
-        except Exception as e:
-            return f"Erro na análise de tendências: {str(e)}"
     
-    def gerar_alerta_gastos(self) -> str:
-        """Gera alertas sobre gastos incomuns ou preocupantes."""
+    def gerar_analise_tendencias(self) -> str:
+        """Gera análise de tendências e padrões."""
         if not self.inicializar_llm():
-            return "Sistema de alertas indisponível."
+            return "Erro ao conectar com o sistema de análise."
         
-        resumo = self.preparar_resumo_dados()
-        if not resumo:
-            return "Dados insuficientes para alertas."
+        if self.df is None or self.df.empty:
+            return "Dados insuficientes para análise de tendências."
         
+        try:
+            resposta = self._completar(self._prompt_tendencias(), max_tokens=TOKENS_POR_SECAO['tendencias'], temperature=0)
+            return resposta or "Não foi possível analisar tendências no momento."
+        except Exception as e:
+            return f"Erro na análise de tendências: {str(e)}"
+    
+    def _prompt_alertas(self, resumo: Dict) -> str:
+        """Monta o prompt dos alertas financeiros."""
         # Calcular métricas para alertas
-        gastos = self.df[self.df['Valor'] > 0]
+        gastos = self.obter_gastos()
+        
+        # Gastos acima de Q3 + 1,5·IQR (um único cálculo de quartis; não é
+        # distorcido pelo próprio gasto extremo, como a média + 2 desvios)
+        valores = gastos['Valor'].to_numpy()
+        if valores.size:
+            q1, q3 = np.quantile(valores, [0.25, 0.75])
+            limite_alto = q3 + 1.5 * (q3 - q1)
+            gastos_altos = gastos[valores > limite_alto]
+        else:
+            gastos_altos = gastos
         
-        # Gastos acima da média + 2 desvios padrão
-        media = gastos['Valor'].mean()
-        desvio = gastos['Valor'].std()
-        limite_alto = media + (2 * desvio)
-        gastos_altos = gastos[gastos['Valor'] > limite_alto]
+        # Concentração em uma categoria (somas por categoria já agrupadas no resumo)
+        gastos_por_categoria = pd.Series(resumo['categorias']['gastos_por_categoria'], dtype=float)
+        concentracao = gastos_por_categoria / gastos['Valor'].sum() * 100
         
-        # Concentração em uma categoria
-        total_gastos = gastos['Valor'].sum()
-        concentracao_categoria = {}
-        for categoria in gastos['Categoria'].unique():
-            valor_cat = gastos[gastos['Categoria'] == categoria]['Valor'].sum()
-            percentual = (valor_cat / total_gastos) * 100
-            concentracao_categoria[categoria] = percentual
+        categoria_dominante = concentracao.idxmax()
+        percentual_dominante = concentracao[categoria_dominante]
         
-        categoria_dominante = max(concentracao_categoria, key=concentracao_categoria.get)
-        percentual_dominante = concentracao_categoria[categoria_dominante]
+        # Dados em formato compacto (CSV e uma linha por categoria), com menos tokens que dicts/JSON;
+        # os 10 maiores gastos elevados bastam para os alertas
+        if gastos_altos.empty:
+            tabela_gastos_altos = 'Nenhum gasto elevado detectado'
+        else:
+            tabela_gastos_altos = gastos_altos.nlargest(10, 'Valor')[['Descricao', 'Valor', 'Categoria']].to_csv(
+                index=False, sep='|', float_format='%.2f'
+            ).strip()
+        linhas_concentracao = "\n".join(
+            f"{categoria}: {percentual:.1f}%" for categoria, percentual in concentracao.sort_values(ascending=False).items()
+        )
         
-        prompt = f"""Você é um consultor financeiro especializado em alertas e controle de riscos financeiros.
+        return f"""Você é um consultor financeiro especializado em alertas e controle de riscos financeiros.
 
 Analise a situação financeira e identifique possíveis alertas ou pontos de atenção:
 
@@ -275,11 +492,11 @@ SITUAÇÃO ATUAL:
 - Gastos acima do normal: {len(gastos_altos)} transações
 - Categoria dominante: {categoria_dominante} ({percentual_dominante:.1f}% dos gastos)
 
-GASTOS ELEVADOS DETECTADOS:
-{gastos_altos[['Descricao', 'Valor', 'Categoria']].to_dict('records') if not gastos_altos.empty else 'Nenhum gasto elevado detectado'}
+GASTOS ELEVADOS DETECTADOS (maiores, separados por |):
+{tabela_gastos_altos}
 
 CONCENTRAÇÃO POR CATEGORIA:
-{json.dumps(concentracao_categoria, indent=2, ensure_ascii=False)}
+{linhas_concentracao}
 
 INSTRUÇÕES:
 1. Identifique possíveis alertas financeiros
@@ -287,46 +504,138 @@ INSTRUÇÕES:
 3. Destaque gastos que merecem atenção
 4. Sugira ações preventivas se necessário
 5. Seja construtivo e evite alarmes desnecessários
+6. No máximo 4 alertas, um tópico curto para cada
 
 Se não houver alertas importantes, parabenize pela gestão financeira.
 Responda em português brasileiro de forma clara e objetiva."""
-
+    
+    def gerar_alerta_gastos(self) -> str:
+        """Gera alertas sobre gastos incomuns ou preocupantes."""
+        if not self.inicializar_llm():
+            return "Sistema de alertas indisponível."
+        
+        resumo = self.preparar_resumo_dados()
+        if not resumo:
+            return "Dados insuficientes para alertas."
+        
         try:
-            response = self.config_llm.client.chat.completions.create(
-                model=self.config_llm.modelo,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=400,
-                temperature=0.3
-            )
-            
-            if response and response.choices:
-                return response.choices[0].message.content.strip()
-            else:
-                return "Sistema de alertas temporariamente indisponível."
-                
+            resposta = self._completar(self._prompt_alertas(resumo), max_tokens=TOKENS_POR_SECAO['alertas'], temperature=0)
+            return resposta or "Sistema de alertas temporariamente indisponível."
         except Exception as e:
             return f"Erro nos alertas: {str(e)}"
     
-    def gerar_todos_insights(self) -> Dict[str, str]:
-        """Gera todos os tipos de insights."""
-        if not self.carregar_dados():
-            return {"erro": "Não foi possível carregar os dados"}
+    def gerar_insights_combinados(self, secoes: Sequence[str] = SECOES_INSIGHTS) -> Dict[str, str]:
+        """
+        Gera as análises pedidas em uma única requisição ao LLM.
         
-        print("🧠 Gerando insights inteligentes...")
+        As tarefas de cada seção são enviadas juntas e o modelo responde um
+        objeto JSON com uma chave por seção.
+        
+        Args:
+            secoes: Seções a gerar (chaves de SECOES_INSIGHTS)
+            
+        Returns:
+            Dicionário seção -> texto, apenas com as seções obtidas
+            (vazio se a requisição ou a leitura do JSON falhar)
+        """
+        if not self.inicializar_llm():
+            return {}
+        
+        resumo = self.preparar_resumo_dados()
+        if not resumo:
+            return {}
+        
+        try:
+            prompts = {
+                'analise_geral': lambda: self._prompt_insight_geral(resumo),
+                'recomendacoes': lambda: self._prompt_recomendacoes(resumo),
+                'tendencias': self._prompt_tendencias,
+                'alertas': lambda: self._prompt_alertas(resumo)
+            }
+            chaves = ", ".join(f'"{secao}"' for secao in secoes)
+            prompt = PROMPT_INSIGHTS_COMBINADOS.format(chaves=chaves) + "\n\n".join(
+                f"=== TAREFA \"{secao}\" ===\n{prompts[secao]()}" for secao in secoes
+            )
+            
+            resposta = self._completar(prompt, max_tokens=sum(TOKENS_POR_SECAO[secao] for secao in secoes) + 100, temperature=0,
+                                       validar=functools.partial(resposta_combinada_valida, secoes=secoes),
+                                       response_format={"type": "json_object"})
+            dados = json.loads(resposta) if resposta else {}
+        except Exception as e:
+            print(f"⚠️  Falha na análise combinada: {e}")
+            return {}
+        
+        if not isinstance(dados, dict):
+            return {}
         
         insights = {}
+        for secao in secoes:
+            texto = dados.get(secao)
+            if isinstance(texto, list):
+                texto = "\n".join(f"- {item}" for item in texto)
+            if texto:
+                insights[secao] = str(texto).strip()
+        return insights
+    
+    def gerar_secoes_em_paralelo(self, secoes: List[str]) -> Dict[str, str]:
+        """
+        Gera seções de insights com uma requisição por seção, todas ao mesmo tempo.
         
-        print("   📊 Análise geral...")
-        insights['analise_geral'] = self.gerar_insight_geral()
+        Cada gerar_* roda em uma thread (asyncio.to_thread) sobre o mesmo cliente,
+        então o tempo total é o da requisição mais lenta, não a soma de todas.
         
-        print("   💡 Recomendações de economia...")
-        insights['recomendacoes'] = self.gerar_recomendacoes_economia()
+        Args:
+            secoes: Seções a gerar (chaves de SECOES_INSIGHTS)
+            
+        Returns:
+            Dicionário seção -> texto
+        """
+        geradores = {
+            'analise_geral': self.gerar_insight_geral,
+            'recomendacoes': self.gerar_recomendacoes_economia,
+            'tendencias': self.gerar_analise_tendencias,
+            'alertas': self.gerar_alerta_gastos
+        }
+        
+        # Configura o cliente e calcula o resumo antes de disparar as threads
+        self.inicializar_llm()
+        self.preparar_resumo_dados()
+        
+        async def gerar_todas():
+            return await asyncio.gather(*(asyncio.to_thread(geradores[secao]) for secao in secoes))
+        
+        return dict(zip(secoes, asyncio.run(gerar_todas())))
+    
+    def gerar_insights(self, secoes: Sequence[str] = SECOES_INSIGHTS) -> Dict[str, str]:
+        """
+        Gera as seções pedidas sobre os dados já carregados (carregar_dados).
         
-        print("   📈 Análise de tendências...")
-        insights['tendencias'] = self.gerar_analise_tendencias()
+        Todas vão em uma única requisição; as ausentes na resposta combinada
+        são geradas individualmente, em paralelo.
         
-        print("   ⚠️  Alertas financeiros...")
-        insights['alertas'] = self.gerar_alerta_gastos()
+        Args:
+            secoes: Seções a gerar (chaves de SECOES_INSIGHTS)
+            
+        Returns:
+            Dicionário seção -> texto, com todas as seções pedidas
+        """
+        insights = self.gerar_insights_combinados(secoes)
+        
+        faltantes = [secao for secao in secoes if secao not in insights]
+        if faltantes:
+            print(f"   🔁 Gerando separadamente: {', '.join(faltantes)}...")
+            insights.update(self.gerar_secoes_em_paralelo(faltantes))
+        
+        return {secao: insights[secao] for secao in secoes}
+    
+    def gerar_todos_insights(self) -> Dict[str, str]:
+        """Gera todos os tipos de insights."""
+        if not self.carregar_dados():
+            return {"erro": "Não foi possível carregar os dados"}
+        
+        print("🧠 Gerando insights inteligentes...")
+        print("   📊 Análise geral, 💡 recomendações, 📈 tendências e ⚠️  alertas (requisição única)...")
+        insights = self.gerar_insights()
         
         print("✅ Insights gerados com sucesso!")
         
@@ -30,7 +30,7 @@ def main():
         extrator = ExtratorCSV()
         dados_extraidos = extrator.processar_todos_arquivos()
         
-        if not dados_extraidos:
+        if dados_extraidos.empty:
             print("❌ Nenhum arquivo CSV encontrado para processar.")
             print("   Verifique se existem arquivos na pasta 'faturas/'")
             return False
@@ -42,8 +42,9 @@ def main():
         print("🔄 ETAPA 2: Tratamento e integração dos dados")
         print("-" * 50)
         
+        # O banco só é gravado ao fim da classificação (uma única escrita por execução)
         tratamento = TratamentoDados()
-        stats = tratamento.integrar_novos_dados(dados_extraidos)
+        stats = tratamento.integrar_novos_dados(dados_extraidos, salvar=False)
         
         print()
         
@@ -53,19 +54,24 @@ def main():
         
         classificador = ClassificadorLLM()
         
-        # Verificar se há registros para classificar
-        classificador.carregar_dados()
+        # Verificar se há registros para classificar (no banco já em memória)
+        classificador.definir_dados(tratamento.df_atual)
         registros_sem_categoria = classificador.identificar_registros_sem_categoria()
         
         if len(registros_sem_categoria) > 0:
             print(f"Encontrados {len(registros_sem_categoria)} registros para classificar...")
-            sucesso_classificacao = classificador.executar_classificacao_completa()
+            sucesso_classificacao = classificador.executar_classificacao_completa(salvar=False)
             
             if not sucesso_classificacao:
                 print("⚠️  Falha na classificação, mas dados foram processados")
         else:
             print("✅ Todos os registros já estão classificados!")
         
+        # Gravar de uma vez os registros novos e as classificações aplicadas
+        # (mesmo DataFrame em memória; também grava se a classificação falhar)
+        if stats['novos_inseridos'] or len(registros_sem_categoria) > 0:
+            tratamento.salvar_banco_dados()
+        
         print()
         
         # Etapa 4: Relatório final
@@ -88,8 +94,7 @@ def main():
         # Se todos estão classificados, mostrar distribuição
         if stats_bd['registros_sem_categoria'] == 0:
             print("\n🎯 Distribuição por categoria:")
-            # Recarregar dados para pegar as classificações
-            classificador.carregar_dados()
+            # As classificações foram aplicadas no mesmo DataFrame em memória
             if classificador.df_dados is not None:
                 categorias = classificador.df_dados['Categoria'].value_counts()
                 for cat, count in categorias.head(5).items():
@@ -1,18 +1,18 @@
 #!/usr/bin/env python3
 """
 Módulo de Tratamento e Padronização de Dados - Sistema de Controle de Gastos Pessoais
-Integra dados extraídos dos CSVs com o banco de dados principal (gastos.xlsx).
+Integra dados extraídos dos CSVs com o banco de dados principal (gastos.parquet).
 """
 
 import pandas as pd
-import os
 from datetime import datetime
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Union
 import hashlib
 from extrator_csv import ExtratorCSV
+from armazenamento import ARQUIVO_BD_PADRAO, banco_existe, carregar_gastos, salvar_gastos
 
 class TratamentoDados:
-    def __init__(self, arquivo_bd: str = "../data/gastos.xlsx"):
+    def __init__(self, arquivo_bd: str = ARQUIVO_BD_PADRAO):
         self.arquivo_bd = arquivo_bd
         self.df_atual = None
         self.novos_registros = 0
@@ -25,9 +25,9 @@ class TratamentoDados:
         Returns:
             DataFrame com os dados atuais
         """
-        if os.path.exists(self.arquivo_bd):
+        if banco_existe(self.arquivo_bd):
             try:
-                df = pd.read_excel(self.arquivo_bd, engine='openpyxl')
+                df = carregar_gastos(self.arquivo_bd)
                 print(f"Banco de dados carregado: {len(df)} registros existentes")
                 return df
             except Exception as e:
@@ -75,111 +75,104 @@ class TratamentoDados:
         # Gerar hash MD5
         return hashlib.md5(string_unica.encode('utf-8')).hexdigest()
     
-    def adicionar_campos_controle(self, dados: List[Dict]) -> List[Dict]:
+    def adicionar_campos_controle(self, dados: pd.DataFrame) -> pd.DataFrame:
         """
         Adiciona campos de controle aos dados (Hash_ID, Data_Processamento).
         
+        As strings normalizadas são montadas coluna a coluna (mesmo formato de
+        gerar_hash_transacao); só o MD5 é calculado item a item.
+        
         Args:
-            dados: Lista de dicionários com os dados
+            dados: DataFrame com os dados
             
         Returns:
-            Lista atualizada com campos de controle
+            DataFrame atualizado com campos de controle
         """
         data_processamento = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        for registro in dados:
-            # Gerar hash único
-            hash_id = self.gerar_hash_transacao(
-                registro['Data'],
-                registro['Descricao'],
-                registro['Valor'],
-                registro['Origem']
-            )
-            
-            # Adicionar campos de controle
-            registro['Hash_ID'] = hash_id
-            registro['Data_Processamento'] = data_processamento
+        # Normalizar dados para hash consistente
+        strings_unicas = (
+            dados['Data'].astype(str).str.strip() + '|' +
+            dados['Descricao'].astype(str).str.strip().str.upper() + '|' +
+            pd.to_numeric(dados['Valor'], errors='coerce').map('{:.2f}'.format) + '|' +
+            dados['Origem'].astype(str).str.strip().str.upper()
+        )
+        
+        # Adicionar campos de controle
+        dados = dados.copy()
+        dados['Hash_ID'] = [hashlib.md5(string_unica.encode('utf-8')).hexdigest() for string_unica in strings_unicas]
+        dados['Data_Processamento'] = data_processamento
         
         return dados
     
-    def identificar_duplicatas(self, novos_dados: List[Dict], df_existente: pd.DataFrame) -> Tuple[List[Dict], List[Dict]]:
+    def identificar_duplicatas(self, novos_dados: pd.DataFrame, df_existente: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
         """
         Identifica registros novos e duplicatas baseado no Hash_ID.
         
         Args:
-            novos_dados: Lista com novos dados a serem inseridos
+            novos_dados: DataFrame com novos dados a serem inseridos
             df_existente: DataFrame com dados já existentes
             
         Returns:
-            Tupla (registros_novos, registros_duplicados)
+            Tupla (registros_novos, quantidade de duplicatas)
         """
-        # Obter hashes existentes
-        hashes_existentes = set()
+        # Hashes já existentes no banco (busca vetorizada)
         if not df_existente.empty and 'Hash_ID' in df_existente.columns:
-            hashes_existentes = set(df_existente['Hash_ID'].tolist())
-        
-        registros_novos = []
-        registros_duplicados = []
-        
-        for registro in novos_dados:
-            if registro['Hash_ID'] in hashes_existentes:
-                registros_duplicados.append(registro)
-            else:
-                registros_novos.append(registro)
+            duplicado = novos_dados['Hash_ID'].isin(df_existente['Hash_ID'])
+        else:
+            duplicado = pd.Series(False, index=novos_dados.index)
         
-        return registros_novos, registros_duplicados
+        return novos_dados[~duplicado], int(duplicado.sum())
     
-    def validar_dados(self, dados: List[Dict]) -> List[Dict]:
+    def validar_dados(self, dados: pd.DataFrame) -> pd.DataFrame:
         """
         Valida e limpa os dados antes da inserção.
         
+        As validações são feitas coluna a coluna; só os registros rejeitados
+        são percorridos, para informar o motivo.
+        
         Args:
-            dados: Lista de dados para validação
+            dados: DataFrame com os dados para validação
             
         Returns:
-            Lista de dados validados
+            DataFrame apenas com os registros válidos
         """
-        dados_validos = []
+        # Verificar se data está no formato correto (dd/mm/aaaa)
+        datas = dados['Data'].astype(str)
+        data_valida = datas.str.count('/') == 2
+        for data_str in datas[~data_valida]:
+            print(f"Data inválida ignorada: {data_str}")
         
-        for registro in dados:
-            # Validações básicas
-            try:
-                # Verificar se data está no formato correto
-                data_str = str(registro['Data'])
-                if len(data_str.split('/')) != 3:
-                    print(f"Data inválida ignorada: {data_str}")
-                    continue
-                
-                # Verificar se valor é numérico
-                valor = float(registro['Valor'])
-                registro['Valor'] = valor
-                
-                # Limpar descrição
-                registro['Descricao'] = str(registro['Descricao']).strip()
-                
-                # Garantir que campos obrigatórios não estão vazios
-                if not registro['Descricao'] or registro['Descricao'] == 'nan':
-                    print(f"Descrição vazia ignorada para valor {valor}")
-                    continue
-                
-                dados_validos.append(registro)
-                
-            except Exception as e:
-                print(f"Erro na validação de registro: {e}")
-                continue
+        # Verificar se valor é numérico
+        valores = pd.to_numeric(dados['Valor'], errors='coerce')
+        valor_valido = valores.notna() | dados['Valor'].isna()
+        for valor in dados.loc[data_valida & ~valor_valido, 'Valor']:
+            print(f"Erro na validação de registro: valor não numérico {valor!r}")
         
-        return dados_validos
+        # Limpar descrição e garantir que não está vazia
+        descricoes = dados['Descricao'].astype(str).str.strip()
+        descricao_valida = descricoes.ne('') & descricoes.ne('nan')
+        for valor in valores[data_valida & valor_valido & ~descricao_valida]:
+            print(f"Descrição vazia ignorada para valor {valor}")
+        
+        dados = dados.assign(Valor=valores, Descricao=descricoes)
+        return dados[data_valida & valor_valido & descricao_valida]
     
-    def integrar_novos_dados(self, novos_dados: List[Dict]) -> Dict:
+    def integrar_novos_dados(self, novos_dados: Union[pd.DataFrame, List[Dict]], salvar: bool = True) -> Dict:
         """
         Integra novos dados ao banco de dados principal.
         
         Args:
-            novos_dados: Lista de novos dados para integração
+            novos_dados: Novos dados para integração (DataFrame do extrator ou lista de dicionários)
+            salvar: Grava o banco atualizado no disco; False quando o chamador
+                    grava uma única vez depois (ex.: após a classificação)
             
         Returns:
             Dicionário com estatísticas do processamento
         """
+        if not isinstance(novos_dados, pd.DataFrame):
+            novos_dados = pd.DataFrame(novos_dados)
+        
         # Carregar banco atual
         self.df_atual = self.carregar_banco_dados()
         
@@ -190,42 +183,41 @@ class TratamentoDados:
         novos_dados = self.validar_dados(novos_dados)
         
         # Identificar duplicatas
-        registros_novos, registros_duplicados = self.identificar_duplicatas(novos_dados, self.df_atual)
+        registros_novos, num_duplicados = self.identificar_duplicatas(novos_dados, self.df_atual)
         
         # Estatísticas
         stats = {
             'total_processados': len(novos_dados),
             'novos_inseridos': len(registros_novos),
-            'duplicatas_ignoradas': len(registros_duplicados),
+            'duplicatas_ignoradas': num_duplicados,
             'total_final': len(self.df_atual) + len(registros_novos)
         }
         
         # Inserir apenas registros novos
-        if registros_novos:
-            df_novos = pd.DataFrame(registros_novos)
-            
+        if not registros_novos.empty:
             # Combinar com dados existentes
             if self.df_atual.empty:
-                self.df_atual = df_novos
+                self.df_atual = registros_novos.reset_index(drop=True)
             else:
-                self.df_atual = pd.concat([self.df_atual, df_novos], ignore_index=True)
+                self.df_atual = pd.concat([self.df_atual, registros_novos], ignore_index=True)
             
             # Salvar banco atualizado
-            self.salvar_banco_dados()
+            if salvar:
+                self.salvar_banco_dados()
             
             print(f"✅ {len(registros_novos)} novos registros inseridos")
         else:
             print("ℹ️  Nenhum registro novo para inserir")
         
-        if registros_duplicados:
-            print(f"⚠️  {len(registros_duplicados)} duplicatas ignoradas")
+        if num_duplicados:
+            print(f"⚠️  {num_duplicados} duplicatas ignoradas")
         
         return stats
     
     def salvar_banco_dados(self):
         """Salva o banco de dados atualizado."""
         try:
-            self.df_atual.to_excel(self.arquivo_bd, index=False, engine='openpyxl')
+            salvar_gastos(self.df_atual, self.arquivo_bd)
             print(f"💾 Banco de dados salvo: {self.arquivo_bd}")
         except Exception as e:
             print(f"❌ Erro ao salvar banco de dados: {e}")
@@ -258,7 +250,7 @@ def main():
     extrator = ExtratorCSV()
     dados_extraidos = extrator.processar_todos_arquivos()
     
-    if not dados_extraidos:
+    if dados_extraidos.empty:
         print("❌ Nenhum dado extraído para processar")
         return
     